@@ -1,5 +1,4 @@
-from flask import Flask, request, jsonify
-from twilio.rest import Client
+from flask import Flask, Request, request, jsonify, Response, g
 from twilio.twiml.voice_response import VoiceResponse
 from flask_cors import CORS
 import os
@@ -7,15 +6,54 @@ from dotenv import load_dotenv
 import json
 from werkzeug.utils import secure_filename
 import tempfile
+import uuid
+import queue
+import threading
+import time
+import cProfile
+import pstats
+import logging
+import multiprocessing
+from concurrent.futures import as_completed
 
 # Import OCR and AI services
-from app.ocr_service import extract_text
-from app.ai_service import summarize_medical_text
+from app import metrics
+from app.ocr_cache import cached_extract_text, get_ocr_cache, upload_name
+from app.uploads import SpooledUpload, spool
+from app.job_queue import get_job_queue, get_batch_executor, QueueFullError
+from app.ocr_service import MIN_PDF_DPI, MAX_PDF_DPI
+from app.summary_cache import cached_summarize, get_cached_summary, store_summary, summary_cache_stats, get_ai_service
+from app.chunked_summary import needs_chunking, summarize_chunked
+from app.summary_budget import budgeted_summarize, fallback_summary, MAX_SUMMARY_LATENCY_BUDGET
+from app.outbox import get_outbox
+from app.record_store import get_record_store, clinic_for_key, RECORD_STORE_ENABLED
+from app.medication_extractor import extract_medications
+from app.twilio_pool import twilio_pool_stats
+from app.warmup import start_warm_up, readiness
+
+logger = logging.getLogger('app')
 
 # Load environment variables
 load_dotenv()
 
+class SpoolingRequest(Request):
+    """
+    Request that writes uploaded files into SpooledUploads as the body is
+    parsed, so they are hashed on the fly and large ones go to disk instead
+    of memory (see app/uploads.py)
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledUpload(filename)
+    
+    @property
+    def max_content_length(self):
+        # A batch carries many documents in one request, so it gets its own limit
+        if self.endpoint == 'process_medical_documents':
+            return BATCH_MAX_UPLOAD_MB * 1024 * 1024
+        return super().max_content_length
+
 app = Flask(__name__)
+app.request_class = SpoolingRequest
 CORS(app)  # Enable CORS for all routes
 
 # File upload configuration
@@ -27,35 +65,181 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB max upload
+# Limit for a whole /process-medical-documents batch; uploads above
+# UPLOAD_SPOOL_MEMORY_MB are spooled to disk, not held in memory
+BATCH_MAX_UPLOAD_MB = int(os.getenv('BATCH_MAX_UPLOAD_MB', '512'))
+
+# Per-request profiling: requests with an X-Profile header equal to
+# PROFILE_TOKEN are run under cProfile (disabled when PROFILE_TOKEN is unset)
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+PROFILE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/profiles')
 
 # Twilio configuration
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
 TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')
 
+# OCR pool workers started with spawn or forkserver import this script again
+# when it is run directly; they must not start the server's background work
+if multiprocessing.parent_process() is None:
+    # Load OCR engines, the AI client and the Twilio connection in the background;
+    # /ready reports when they are done. Production servers call warm_up() from a
+    # worker startup hook instead.
+    if os.getenv('WARM_UP_ON_START', 'true').lower() == 'true':
+        start_warm_up()
+
+    # Start sending notifications left in the outbox by a previous run
+    get_outbox()
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.metrics_token = metrics.begin_request()
+    if PROFILE_TOKEN and request.headers.get('X-Profile') == PROFILE_TOKEN:
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def finish_request_metrics(response):
+    """Record request latency and report stage timings in a Server-Timing header"""
+    if 'metrics_token' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_start
+    timings = metrics.end_request(g.metrics_token)
+    
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(PROFILE_FOLDER, exist_ok=True)
+        profile_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unknown'}-{uuid.uuid4().hex[:8]}.prof"
+        profile_path = os.path.join(PROFILE_FOLDER, profile_name)
+        profiler.dump_stats(profile_path)
+        # Top functions by cumulative time, readable without loading the .prof file
+        with open(f"{profile_path}.txt", 'w', encoding='utf-8') as f:
+            pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(20)
+        logger.info(f"Profile of {request.method} {request.path} saved to static/profiles/{profile_name}")
+        response.headers['X-Profile-File'] = profile_name
+    
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=endpoint, status=response.status_code)
+    response.headers['Server-Timing'] = metrics.server_timing_header(timings, elapsed)
+    return response
+
 # Helper function to check allowed file extensions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Helper function to read the optional PDF render resolution of a request
+def requested_dpi():
+    value = request.args.get('dpi', request.form.get('dpi', ''))
+    if value == '':
+        return None
+    try:
+        dpi = int(value)
+    except ValueError:
+        raise ValueError(f"Invalid dpi: {value}")
+    if not MIN_PDF_DPI <= dpi <= MAX_PDF_DPI:
+        raise ValueError(f"dpi must be between {MIN_PDF_DPI} and {MAX_PDF_DPI}")
+    return dpi
+
+def requested_clinic():
+    """
+    Return the clinic of the request's X-Api-Key header, or None without one
+    
+    Raises:
+        PermissionError: The key is not one of RECORDS_API_KEYS
+    """
+    api_key = request.headers.get('X-Api-Key')
+    if not api_key:
+        return None
+    clinic = clinic_for_key(api_key)
+    if clinic is None:
+        raise PermissionError("Invalid API key")
+    return clinic
+
+def requested_summary_budget():
+    """Read the optional summary_budget parameter: seconds to wait for the AI summary"""
+    value = request.args.get('summary_budget', request.form.get('summary_budget', ''))
+    if value == '':
+        return None
+    try:
+        budget = float(value)
+    except ValueError:
+        raise ValueError(f"Invalid summary_budget: {value}")
+    if not 0 <= budget <= MAX_SUMMARY_LATENCY_BUDGET:
+        raise ValueError(f"summary_budget must be between 0 and {MAX_SUMMARY_LATENCY_BUDGET} seconds")
+    return budget
+
+# Helper functions for uploads processed after the request that carried them
+# has ended (async jobs, streamed and batch responses)
+def detached_upload(file):
+    """Take the upload's spooled buffer over from the request; close it when done"""
+    upload, owned = spool(file)
+    return upload if owned else upload.detach()
+
+def run_upload_pipeline(upload, **kwargs):
+    """run_document_pipeline on a detached upload, closing it afterwards"""
+    try:
+        return run_document_pipeline(upload, **kwargs)
+    finally:
+        upload.close()
+
+# Helper function to read the client's idempotency key, so a retried request
+# doesn't notify contacts twice
+def idempotency_key(data):
+    return request.headers.get('Idempotency-Key') or data.get('idempotencyKey') or uuid.uuid4().hex
+
+# Helper function to check that notifications can be sent before they are
+# recorded in the outbox; returns a 503 response if Twilio isn't configured
+def twilio_not_configured(from_number=TWILIO_PHONE_NUMBER):
+    missing = [name for name, value in (
+        ('TWILIO_ACCOUNT_SID', TWILIO_ACCOUNT_SID),
+        ('TWILIO_AUTH_TOKEN', TWILIO_AUTH_TOKEN),
+        ('TWILIO_PHONE_NUMBER', from_number)
+    ) if not value]
+    if not missing:
+        return None
+    return jsonify({
+        "status": "error",
+        "message": f"Notifications are not available: {', '.join(missing)} not configured"
+    }), 503
+
 @app.route('/send-alert', methods=['POST'])
 def send_alert():
     try:
         data = request.json
-        account_sid = data.get('accountSid', TWILIO_ACCOUNT_SID)
-        auth_token = data.get('authToken', TWILIO_AUTH_TOKEN)
+        # Notifications wait in the durable outbox and may be sent after a
+        # restart, when credentials sent with a request would be gone, so only
+        # the account configured in the environment can be used
+        if data.get('accountSid', TWILIO_ACCOUNT_SID) != TWILIO_ACCOUNT_SID or \
+                data.get('authToken', TWILIO_AUTH_TOKEN) != TWILIO_AUTH_TOKEN:
+            return jsonify({
+                "status": "error",
+                "message": "accountSid and authToken can't be set per request; configure TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN"
+            }), 400
         from_number = data.get('fromNumber', TWILIO_PHONE_NUMBER)
+        not_configured = twilio_not_configured(from_number)
+        if not_configured:
+            return not_configured
         to_number = data['toNumber']
         message_body = data['message']
-
-        client = Client(account_sid, auth_token)
         
-        message = client.messages.create(
-            body=message_body,
-            from_=from_number,
-            to=to_number
-        )
+        request_id = idempotency_key(data)
+        notifications, duplicate = get_outbox().enqueue(request_id, [{
+            "kind": "sms",
+            "account_sid": TWILIO_ACCOUNT_SID,
+            "from_number": from_number,
+            "to_number": to_number,
+            "contact": to_number,
+            "body": message_body
+        }])
 
-        return jsonify({"status": "success", "sid": message.sid}), 200
+        return jsonify({
+            "status": "success",
+            "request_id": request_id,
+            "duplicate": duplicate,
+            "notification": notifications[0]
+        }), 202
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
@@ -63,13 +247,13 @@ def send_alert():
 def emergency_contact():
     try:
         data = request.json
+        not_configured = twilio_not_configured()
+        if not_configured:
+            return not_configured
         location = data.get('location', {})
         contact_info = data.get('contactInfo', {})
         user_info = data.get('userInfo', {})
         
-        # Initialize Twilio client
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-        
         # Format emergency message with location
         lat = location.get('latitude', 'unknown')
         lng = location.get('longitude', 'unknown')
@@ -85,54 +269,54 @@ def emergency_contact():
             f"Allergies: {user_info.get('allergies', 'None reported')}."
         )
         
-        response = {"status": "success", "messages": []}
+        contacts = contact_info.get('emergencyContacts', [])
         
-        # Send SMS to emergency contacts
-        for contact in contact_info.get('emergencyContacts', []):
-            try:
-                message = client.messages.create(
-                    body=emergency_message,
-                    from_=TWILIO_PHONE_NUMBER,
-                    to=contact.get('phoneNumber')
-                )
-                response["messages"].append({
-                    "contact": contact.get('name'),
-                    "sid": message.sid,
-                    "status": "sent"
-                })
-            except Exception as e:
-                response["messages"].append({
-                    "contact": contact.get('name'),
-                    "error": str(e),
-                    "status": "failed"
-                })
-        
-        # Initiate call to first emergency contact if available
-        if contact_info.get('emergencyContacts') and len(contact_info['emergencyContacts']) > 0:
-            first_contact = contact_info['emergencyContacts'][0]
-            try:
+        # Record an SMS to every emergency contact and a call to the first one;
+        # the outbox sender dispatches them concurrently, call first
+        notifications = [{
+            "kind": "sms",
+            "account_sid": TWILIO_ACCOUNT_SID,
+            "from_number": TWILIO_PHONE_NUMBER,
+            "to_number": contact.get('phoneNumber'),
+            "contact": contact.get('name'),
+            "body": emergency_message
+        } for contact in contacts]
+        if contacts:
+            notifications.append({
+                "kind": "call",
+                "account_sid": TWILIO_ACCOUNT_SID,
+                "from_number": TWILIO_PHONE_NUMBER,
+                "to_number": contacts[0].get('phoneNumber'),
+                "contact": contacts[0].get('name'),
                 # Use inline TwiML instead of URL
-                call = client.calls.create(
-                    twiml='<Response><Say voice="alice">This is an emergency alert. Someone has requested medical assistance and has listed you as an emergency contact. Please check your text messages for more information and respond accordingly.</Say><Pause length="2"/><Say voice="alice">Again, this is an emergency medical alert. Please check your text messages for the location and medical information of the person who needs assistance.</Say></Response>',
-                    to=first_contact.get('phoneNumber'),
-                    from_=TWILIO_PHONE_NUMBER
-                )
-                response["call"] = {
-                    "sid": call.sid,
-                    "status": "initiated",
-                    "contact": first_contact.get('name')
-                }
-            except Exception as e:
-                print(f"CALL ERROR: {str(e)}")  # This will print the specific error
-                response["call"] = {
-                    "error": str(e), 
-                    "status": "failed"
-                }
+                "body": '<Response><Say voice="alice">This is an emergency alert. Someone has requested medical assistance and has listed you as an emergency contact. Please check your text messages for more information and respond accordingly.</Say><Pause length="2"/><Say voice="alice">Again, this is an emergency medical alert. Please check your text messages for the location and medical information of the person who needs assistance.</Say></Response>'
+            })
+        
+        request_id = idempotency_key(data)
+        recorded, duplicate = get_outbox().enqueue(request_id, notifications)
+        
+        response = {
+            "status": "success",
+            "request_id": request_id,
+            "duplicate": duplicate,
+            "messages": [entry for entry in recorded if entry["kind"] == "sms"]
+        }
+        calls = [entry for entry in recorded if entry["kind"] == "call"]
+        if calls:
+            response["call"] = calls[0]
         
-        return jsonify(response), 200
+        return jsonify(response), 202
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/notifications/<request_id>', methods=['GET'])
+def notification_status(request_id):
+    """Report the delivery state of the notifications recorded for a request"""
+    notifications = get_outbox().get_request(request_id)
+    if not notifications:
+        return jsonify({"status": "error", "message": "Unknown request"}), 404
+    return jsonify({"status": "success", "request_id": request_id, "notifications": notifications}), 200
+
 @app.route('/emergency-twiml', methods=['POST'])
 def emergency_twiml():
     """Generate TwiML for the emergency call"""
@@ -177,38 +361,43 @@ def process_medical_document():
     print(f"Received file: {file.filename}, Content-Type: {file.content_type}")
     
     if file and allowed_file(file.filename):
-        # Process the file with OCR
         try:
-            # Extract text from the document
-            print(f"Starting OCR processing for {file.filename}")
-            ocr_result = extract_text(file)
-            
-            if not ocr_result["success"]:
-                print(f"OCR failed: {ocr_result['error']}")
-                return jsonify({
-                    "status": "error", 
-                    "message": f"OCR processing failed: {ocr_result['error']}"
-                }), 500
-            
-            # Log the extracted text for debugging
-            extracted_text = ocr_result["text"]
-            print(f"Extracted text (first 100 chars): {extracted_text[:100]}...")
-            
-            # Summarize the extracted text
-            print("Starting AI summarization")
-            summary_result = summarize_medical_text(ocr_result["text"])
-            
-            if not summary_result["success"]:
-                print(f"AI summarization failed: {summary_result['error']}")
-            
-            # Return the results
+            dpi = requested_dpi()
+            summary_budget = requested_summary_budget()
+            clinic = requested_clinic()
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        except PermissionError as e:
+            return jsonify({"status": "error", "message": str(e)}), 401
+        
+        # Async mode: queue the document and return a job id right away
+        if request.args.get('async', request.form.get('async', '')).lower() in ('1', 'true', 'yes'):
+            upload = detached_upload(file)
+            try:
+                # The budget decides whether a fallback summary is returned, so
+                # jobs with different budgets are not deduplicated
+                job, created = get_job_queue().submit(
+                    f"{upload.content_hash}:{dpi}:{summary_budget}:{clinic}", run_upload_pipeline, upload,
+                    dpi=dpi, summary_budget=summary_budget, clinic=clinic
+                )
+            except QueueFullError as e:
+                upload.close()
+                return jsonify({"status": "error", "message": str(e)}), 503
+            if not created:
+                upload.close()
+            print(f"{'Queued' if created else 'Deduplicated'} job {job.id} for {file.filename}")
             return jsonify({
-                "status": "success",
-                "original_text": ocr_result["text"],
-                "summary": summary_result["summary"] if summary_result["success"] else "Summarization failed",
-                "error": summary_result["error"]
-            }), 200
-            
+                "status": "accepted",
+                "job_id": job.id,
+                "job_status": job.status,
+                "status_url": f"/jobs/{job.id}",
+                "result_url": f"/jobs/{job.id}/result"
+            }), 202
+
+        # Process the file with OCR
+        try:
+            body, status_code = run_document_pipeline(file, dpi=dpi, summary_budget=summary_budget, clinic=clinic)
+            return jsonify(body), status_code
         except Exception as e:
             print(f"Error processing document: {str(e)}")
             import traceback
@@ -220,6 +409,302 @@ def process_medical_document():
             "message": f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
         }), 400
 
+def summarize_text(text, progress=None, pages=None, budget=None):
+    """
+    Summarize extracted text, reporting summary chunks to progress as they arrive
+    
+    Chunks are streamed when the AI service provides stream_medical_summary;
+    otherwise the finished summary is reported as a single chunk. Text too long
+    for one model call is summarized chunk by chunk (pages is the OCR page
+    metadata used to split it on page boundaries). If the model fails, or takes
+    longer than budget seconds (non-streamed calls), a local extractive summary
+    marked as a fallback is returned instead.
+    """
+    if needs_chunking(text):
+        summary_result = budgeted_summarize(text, lambda text: summarize_chunked(text, pages), budget)
+        if progress is not None and summary_result["success"]:
+            progress("summary_token", {"text": summary_result["summary"]})
+        return summary_result
+    
+    # Optional generator of summary text chunks, used by the progress stream
+    stream_medical_summary = None
+    summary_result = None
+    if progress is not None:
+        try:
+            stream_medical_summary = getattr(get_ai_service(), 'stream_medical_summary', None)
+            summary_result = get_cached_summary(text)
+        except Exception as e:
+            print(f"Error loading AI service: {str(e)}")
+            summary_result = fallback_summary(text, "error", str(e))
+    if summary_result is None and (progress is None or stream_medical_summary is None):
+        summary_result = budgeted_summarize(text, budget=budget)
+    if summary_result is not None:
+        if progress is not None and summary_result["success"]:
+            progress("summary_token", {"text": summary_result["summary"]})
+        return summary_result
+    
+    chunks = []
+    try:
+        for chunk in stream_medical_summary(text):
+            chunks.append(chunk)
+            progress("summary_token", {"text": chunk})
+        summary_result = {"success": True, "summary": "".join(chunks), "error": None}
+        store_summary(text, summary_result)
+        return summary_result
+    except Exception as e:
+        return fallback_summary(text, "error", str(e))
+
+def run_document_pipeline(file_obj, dpi=None, progress=None, summary_budget=None, clinic=None):
+    """
+    Run OCR and AI summarization on a document
+    
+    Args:
+        file_obj: Uploaded file or file object opened in binary mode (rb)
+        dpi: Optional render resolution for OCR'd PDF pages
+        progress: Optional callback(event, data) notified as each stage completes
+        summary_budget: Optional seconds to wait for the AI summary before
+            falling back to a local one (defaults to SUMMARY_LATENCY_BUDGET)
+        clinic: Clinic the request authenticated as; the document is saved to
+            its records when RECORD_STORE_ENABLED is set
+
+    Returns:
+        tuple: (response body dict, HTTP status code)
+    """
+    # Extract text from the document
+    print(f"Starting OCR processing for {upload_name(file_obj)}")
+    with metrics.stage("ocr"):
+        ocr_result = cached_extract_text(file_obj, dpi=dpi, progress=progress)
+    
+    if progress is not None:
+        progress("ocr_done", {
+            "success": ocr_result["success"],
+            "pages": ocr_result.get("pages", 0),
+            "cached": ocr_result.get("cached", False),
+            "text": ocr_result["text"]
+        })
+    
+    if not ocr_result["success"]:
+        print(f"OCR failed: {ocr_result['error']}")
+        return {
+            "status": "error", 
+            "message": f"OCR processing failed: {ocr_result['error']}"
+        }, 500
+    
+    # Log the extracted text for debugging
+    extracted_text = ocr_result["text"]
+    print(f"Extracted text (first 100 chars): {extracted_text[:100]}...")
+    
+    # Structured medications and follow-ups from the local extractor, ready
+    # before (and independent of) the AI summary
+    with metrics.stage("medications"):
+        medications = extract_medications(extracted_text)
+    if progress is not None:
+        progress("medications", medications)
+    
+    # Summarize the extracted text
+    print("Starting AI summarization")
+    if progress is not None:
+        progress("summary_started", {})
+    ocr_metadata = ocr_result.get("metadata", {})
+    with metrics.stage("summarize"):
+        summary_result = summarize_text(
+            ocr_result["text"], progress=progress, pages=ocr_metadata.get("pages"), budget=summary_budget)
+    
+    if not summary_result["success"]:
+        print(f"AI summarization failed: {summary_result['error']}")
+    elif summary_result.get("fallback"):
+        print(f"Using local summary ({summary_result['fallback_reason']}): {summary_result['model_error']}")
+    
+    # Return the results
+    body = {
+        "status": "success",
+        "original_text": ocr_result["text"],
+        "summary": summary_result["summary"] if summary_result["success"] else "Summarization failed",
+        "error": summary_result["error"],
+        "medications": medications,
+        "ocr_metadata": ocr_metadata
+    }
+    summary_metadata = {}
+    if "chunks" in summary_result:
+        summary_metadata["chunks"] = summary_result["chunks"]
+        summary_metadata["reduce_seconds"] = summary_result["reduce_seconds"]
+    if summary_result.get("fallback"):
+        summary_metadata["fallback"] = True
+        summary_metadata["fallback_reason"] = summary_result["fallback_reason"]
+        summary_metadata["model_error"] = summary_result["model_error"]
+    if summary_metadata:
+        body["summary_metadata"] = summary_metadata
+    
+    # Keep the OCR text and summary so the clinic can list and search the record later
+    if not RECORD_STORE_ENABLED or clinic is None:
+        return body, 200
+    try:
+        body["record_id"] = get_record_store().save(
+            clinic,
+            ocr_result["content_hash"],
+            upload_name(file_obj),
+            ocr_result["text"],
+            summary=summary_result["summary"] if summary_result["success"] else None,
+            summary_error=summary_result["error"],
+            pages=ocr_result.get("pages")
+        )
+    except Exception as e:
+        print(f"Failed to save medical record: {str(e)}")
+    return body, 200
+
+@app.route('/process-medical-document/stream', methods=['POST'])
+def process_medical_document_stream():
+    """
+    Process a medical document and stream progress as Server-Sent Events
+
+    Events: page_text / page_rasterized / page_ocr per page, ocr_done,
+    medications, summary_started, summary_token, and finally done (carrying the same body
+    as /process-medical-document) or error.
+    """
+    if 'file' not in request.files:
+        return jsonify({"status": "error", "message": "No file part"}), 400
+    
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({"status": "error", "message": "No selected file"}), 400
+    if not allowed_file(file.filename):
+        return jsonify({
+            "status": "error", 
+            "message": f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+        }), 400
+    
+    try:
+        dpi = requested_dpi()
+        summary_budget = requested_summary_budget()
+        clinic = requested_clinic()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except PermissionError as e:
+        return jsonify({"status": "error", "message": str(e)}), 401
+    
+    upload = detached_upload(file)
+    events = queue.Queue()
+    
+    def progress(event, data):
+        events.put((event, data))
+    
+    def worker():
+        try:
+            body, status_code = run_upload_pipeline(
+                upload, dpi=dpi, progress=progress, summary_budget=summary_budget, clinic=clinic)
+            events.put(("done" if status_code < 400 else "error", dict(body, http_status=status_code)))
+        except Exception as e:
+            print(f"Error processing document: {str(e)}")
+            events.put(("error", {"status": "error", "message": str(e), "http_status": 500}))
+    
+    threading.Thread(target=worker, daemon=True).start()
+    
+    def generate():
+        while True:
+            try:
+                event, data = events.get(timeout=15)
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            if event in ("done", "error"):
+                break
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@app.route('/process-medical-documents', methods=['POST'])
+def process_medical_documents():
+    """
+    Process many medical documents from one multipart upload
+
+    Documents are processed concurrently and the response streams one NDJSON
+    line per document as soon as it finishes, followed by a summary line.
+    Failures are reported per file and never abort the rest of the batch.
+    """
+    files = request.files.getlist('files') + request.files.getlist('file')
+    if not files:
+        return jsonify({"status": "error", "message": "No files uploaded"}), 400
+    
+    try:
+        dpi = requested_dpi()
+        summary_budget = requested_summary_budget()
+        clinic = requested_clinic()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except PermissionError as e:
+        return jsonify({"status": "error", "message": str(e)}), 401
+    
+    # Keep every upload past the end of the request; streaming outlives it
+    documents = []
+    rejected = []
+    for index, file in enumerate(files):
+        if file.filename and allowed_file(file.filename):
+            documents.append((index, file.filename, detached_upload(file)))
+        else:
+            rejected.append((index, file.filename))
+    print(f"Received batch of {len(files)} files ({len(rejected)} rejected)")
+    
+    def generate():
+        succeeded = 0
+        for index, filename in rejected:
+            yield json.dumps({
+                "index": index,
+                "filename": filename,
+                "status": "error",
+                "http_status": 400,
+                "message": f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+            }) + "\n"
+        
+        executor = get_batch_executor()
+        futures = {
+            executor.submit(run_upload_pipeline, upload, dpi=dpi, summary_budget=summary_budget,
+                            clinic=clinic): (index, filename)
+            for index, filename, upload in documents
+        }
+        for future in as_completed(futures):
+            index, filename = futures[future]
+            try:
+                body, status_code = future.result()
+            except Exception as e:
+                print(f"Error processing {filename}: {str(e)}")
+                body, status_code = {"status": "error", "message": str(e)}, 500
+            if status_code < 400:
+                succeeded += 1
+            yield json.dumps(dict(body, index=index, filename=filename, http_status=status_code)) + "\n"
+        
+        yield json.dumps({
+            "status": "done",
+            "total": len(files),
+            "succeeded": succeeded,
+            "failed": len(files) - succeeded
+        }) + "\n"
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report the status of an async document processing job"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found or expired"}), 404
+    return jsonify({"status": "success", "job": job.to_dict()}), 200
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Return the result of a finished async document processing job"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found or expired"}), 404
+    if not job.finished:
+        return jsonify({"status": "pending", "job": job.to_dict()}), 202
+    if job.result is None:
+        return jsonify({"status": "error", "message": job.error}), job.http_status
+    return jsonify(job.result), job.http_status
+
 @app.route('/test-ocr', methods=['GET'])
 def test_ocr():
     """
@@ -247,7 +732,7 @@ def test_ocr():
             
             # Summarize the text
             print("Starting AI summarization of sample text file")
-            summary_result = summarize_medical_text(ocr_result["text"])
+            summary_result = cached_summarize(ocr_result["text"])
             
             # Return the results
             return jsonify({
@@ -278,7 +763,7 @@ def test_ocr():
         # Process the sample file
         with open(sample_path, "rb") as img_file:
             print("Starting OCR processing for sample file")
-            ocr_result = extract_text(img_file)
+            ocr_result = cached_extract_text(img_file)
         
         if not ocr_result["success"]:
             print(f"OCR failed: {ocr_result['error']}")
@@ -331,7 +816,7 @@ def test_ocr():
         
         # Summarize the extracted text
         print("Starting AI summarization")
-        summary_result = summarize_medical_text(ocr_result["text"])
+        summary_result = cached_summarize(ocr_result["text"])
         
         # Return the results
         return jsonify({
@@ -347,5 +832,104 @@ def test_ocr():
         traceback.print_exc()
         return jsonify({"status": "error", "message": str(e)}), 500
 
+def requested_page():
+    """Read the page and per_page query parameters"""
+    return request.args.get('page', 1, type=int), request.args.get('per_page', None, type=int)
+
+def records_clinic():
+    """
+    Authenticate a /records request
+    
+    Returns:
+        tuple: (clinic, None), or (None, error response) if the record store
+            is disabled or the request has no valid X-Api-Key
+    """
+    if not RECORD_STORE_ENABLED:
+        return None, (jsonify({"status": "error", "message": "The record store is not enabled"}), 404)
+    try:
+        clinic = requested_clinic()
+    except PermissionError as e:
+        return None, (jsonify({"status": "error", "message": str(e)}), 401)
+    if clinic is None:
+        return None, (jsonify({"status": "error", "message": "Missing API key (X-Api-Key)"}), 401)
+    return clinic, None
+
+@app.route('/records', methods=['GET'])
+def list_records():
+    """List the clinic's stored medical records, newest first (paginated with page and per_page)"""
+    clinic, error = records_clinic()
+    if error:
+        return error
+    page, per_page = requested_page()
+    return jsonify(dict(get_record_store().list(clinic, page, per_page), status="success")), 200
+
+@app.route('/records/search', methods=['GET'])
+def search_records():
+    """Full-text search over the clinic's OCR text, summaries and file names (q, page, per_page)"""
+    clinic, error = records_clinic()
+    if error:
+        return error
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"status": "error", "message": "Missing search query (q)"}), 400
+    page, per_page = requested_page()
+    return jsonify(dict(get_record_store().search(clinic, query, page, per_page), status="success", query=query)), 200
+
+@app.route('/records/<record_id>', methods=['GET'])
+def get_record(record_id):
+    """Return one of the clinic's records with its full OCR text and summary"""
+    clinic, error = records_clinic()
+    if error:
+        return error
+    record = get_record_store().get(clinic, record_id)
+    if record is None:
+        return jsonify({"status": "error", "message": "Unknown record"}), 404
+    return jsonify({"status": "success", "record": record}), 200
+
+@app.route('/records/<record_id>', methods=['DELETE'])
+def delete_record(record_id):
+    """Delete one of the clinic's records"""
+    clinic, error = records_clinic()
+    if error:
+        return error
+    if not get_record_store().delete(clinic, record_id):
+        return jsonify({"status": "error", "message": "Unknown record"}), 404
+    return jsonify({"status": "success"}), 200
+
+@app.route('/ocr-cache/stats', methods=['GET'])
+def ocr_cache_stats():
+    """Report OCR cache size and hit/miss counters"""
+    return jsonify({"status": "success", "cache": get_ocr_cache().stats()}), 200
+
+@app.route('/summary-cache/stats', methods=['GET'])
+def summary_cache_stats_route():
+    """Report summary cache size, hit/miss counters and shared in-flight calls"""
+    return jsonify({"status": "success", "cache": summary_cache_stats()}), 200
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once warm-up finished and the required components are ready, else 503"""
+    state = readiness()
+    return jsonify(dict(state, status="success" if state["ready"] else "error")), 200 if state["ready"] else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Stage and request latency histograms in the Prometheus text format"""
+    return Response(metrics.render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/twilio/stats', methods=['GET'])
+def twilio_stats():
+    """Report Twilio client timings and connection reuse, and outbox notification counts"""
+    return jsonify({"status": "success", "clients": twilio_pool_stats(), "outbox": get_outbox().stats()}), 200
+
+@app.route('/ocr-cache/invalidate', methods=['POST'])
+def ocr_cache_invalidate():
+    """
+    Invalidate cached OCR results for one document (by content hash) or all documents
+    """
+    data = request.get_json(silent=True) or {}
+    removed = get_ocr_cache().invalidate(data.get('contentHash'))
+    return jsonify({"status": "success", "removed": removed}), 200
+
 if __name__ == '__main__':
     app.run(debug=True)
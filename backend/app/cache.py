@@ -0,0 +1,228 @@
+import json
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger('cache')
+
+
+def _json_size(value):
+    """Approximate the memory footprint of a JSON-serializable value"""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 1
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by the total size of its values
+
+    Args:
+        max_bytes: Evict least recently used entries once the summed size exceeds this
+        max_entries: Optional cap on the number of entries
+        ttl: Optional time-to-live in seconds for each entry
+        sizeof: Function returning the size of a value (defaults to its JSON length)
+    """
+
+    def __init__(self, max_bytes, max_entries=None, ttl=None, sizeof=_json_size):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size=None):
+        size = self._sizeof(value) if size is None else size
+        if size > self.max_bytes:
+            # Never let a single oversized value flush the whole cache
+            return False
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._total_bytes += size
+            self._evict()
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            return self._remove(key)
+
+    def delete_where(self, predicate):
+        """Delete every entry whose key matches predicate, returning the count"""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._total_bytes = 0
+            return count
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._total_bytes -= entry[1]
+        return True
+
+    def _evict(self):
+        while self._entries and (
+            self._total_bytes > self.max_bytes
+            or (self.max_entries and len(self._entries) > self.max_entries)
+        ):
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+
+
+class DiskCache:
+    """
+    JSON file cache stored in a directory, bounded by total size on disk
+
+    Entries are evicted oldest-access-first; reads refresh the file's mtime so
+    the directory itself records recency and survives restarts.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path, None)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return default
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {str(e)}")
+            self.delete(key)
+            with self._lock:
+                self.misses += 1
+            return default
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f, default=str)
+            # Atomic rename so concurrent readers never see a partial entry
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write cache entry {path}: {str(e)}")
+            return False
+        self._evict()
+        return True
+
+    def delete(self, key):
+        try:
+            os.unlink(self._path(key))
+            return True
+        except OSError:
+            return False
+
+    def delete_where(self, predicate):
+        count = 0
+        for key, _, _ in self._scan():
+            if predicate(key) and self.delete(key):
+                count += 1
+        return count
+
+    def clear(self):
+        return self.delete_where(lambda key: True)
+
+    def stats(self):
+        entries = self._scan()
+        with self._lock:
+            return {
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    def _scan(self):
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((name[:-len('.json')], st.st_size, st.st_mtime))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes:
+                return
+            for key, size, _ in sorted(entries, key=lambda entry: entry[2]):
+                if total <= self.max_bytes:
+                    break
+                if self.delete(key):
+                    total -= size
+                    self.evictions += 1
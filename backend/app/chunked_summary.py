@@ -0,0 +1,221 @@
+import os
+import re
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from app.summary_cache import cached_summarize
+
+logger = logging.getLogger('chunked_summary')
+
+# Chunking configuration (token counts are estimates, see estimate_tokens)
+SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', '6000'))
+SUMMARY_CONCURRENCY = int(os.getenv('SUMMARY_CONCURRENCY', '4'))
+SUMMARY_TOKEN_BUDGET = int(os.getenv('SUMMARY_TOKEN_BUDGET', '24000'))
+
+# A line in capitals ("MEDICATIONS") or a short label ending in a colon
+# ("Discharge Summary:") starts a new section
+SECTION_HEADING = re.compile(r'^\s*(?:[A-Z][A-Z0-9 /&,\-]{3,60}|[A-Z][\w /&,\-]{2,40}:)\s*$')
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def needs_chunking(text):
+    return estimate_tokens(text) > SUMMARY_CHUNK_TOKENS
+
+
+def split_pages(text, pages=None):
+    """
+    Split document text into (page number, text) pairs
+
+    Args:
+        pages: Optional per-page metadata from extract_text; its "chars" counts
+            are the lengths of the page texts that were joined into text
+    """
+    if pages and sum(page.get("chars", 0) for page in pages) == len(text):
+        result = []
+        offset = 0
+        for page in pages:
+            result.append((page["page"], text[offset:offset + page["chars"]]))
+            offset += page["chars"]
+        return result
+    # Form feeds separate pages in plain-text exports
+    return [(number + 1, page_text) for number, page_text in enumerate(text.split('\f'))]
+
+
+def split_sections(text):
+    """Split text before each section heading"""
+    sections = []
+    current = []
+    for line in text.splitlines(keepends=True):
+        if current and SECTION_HEADING.match(line):
+            sections.append("".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("".join(current))
+    return sections
+
+
+def _split_oversized(section, max_chars):
+    """Split a section that is larger than a chunk on line boundaries"""
+    pieces = []
+    current = ""
+    for line in section.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if len(current) + len(line) > max_chars:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def make_chunks(text, pages=None, chunk_tokens=None):
+    """
+    Pack page sections into chunks of at most chunk_tokens estimated tokens
+
+    Returns:
+        list: dicts with "text", "first_page" and "last_page"
+    """
+    max_chars = (chunk_tokens or SUMMARY_CHUNK_TOKENS) * 4
+    chunks = []
+    current = None
+    for page_number, page_text in split_pages(text, pages):
+        for section in split_sections(page_text):
+            for piece in _split_oversized(section, max_chars) if len(section) > max_chars else [section]:
+                if current and len(current["text"]) + len(piece) > max_chars:
+                    chunks.append(current)
+                    current = None
+                if current is None:
+                    current = {"text": "", "first_page": page_number, "last_page": page_number}
+                current["text"] += piece
+                current["last_page"] = page_number
+    if current and current["text"].strip():
+        chunks.append(current)
+    return chunks
+
+
+class TokenBudget:
+    """Weighted semaphore limiting the estimated tokens of concurrent model calls"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self._available = tokens
+        self._condition = threading.Condition()
+
+    def acquire(self, tokens):
+        # A single request larger than the budget runs alone
+        tokens = min(tokens, self.tokens)
+        with self._condition:
+            self._condition.wait_for(lambda: self._available >= tokens)
+            self._available -= tokens
+        return tokens
+
+    def release(self, tokens):
+        with self._condition:
+            self._available += tokens
+            self._condition.notify_all()
+
+
+_budget = TokenBudget(SUMMARY_TOKEN_BUDGET)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_chunk_executor():
+    """Return the thread pool shared by all chunked summaries, creating it on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=SUMMARY_CONCURRENCY, thread_name_prefix='summary-chunk')
+    return _executor
+
+
+def _summarize_chunk(index, chunk):
+    tokens = estimate_tokens(chunk["text"])
+    held = _budget.acquire(tokens)
+    start = time.perf_counter()
+    try:
+        result = cached_summarize(chunk["text"])
+    except Exception as e:
+        result = {"success": False, "summary": None, "error": str(e)}
+    finally:
+        _budget.release(held)
+    return result, {
+        "index": index,
+        "pages": [chunk["first_page"], chunk["last_page"]],
+        "tokens": tokens,
+        "seconds": round(time.perf_counter() - start, 3),
+        "cached": result.get("cached", False),
+        "success": result["success"],
+        "error": result.get("error") if not result["success"] else None
+    }
+
+
+def _combine(parts):
+    """Merge partial summaries, reducing again if they don't fit in one chunk"""
+    combined = "\n\n".join(parts)
+    if needs_chunking(combined) and len(parts) > 1:
+        middle = len(parts) // 2
+        return _combine([_combine(parts[:middle]), _combine(parts[middle:])])
+    result = cached_summarize(combined)
+    if not result["success"]:
+        raise Exception(result["error"] or "Failed to combine partial summaries")
+    return result["summary"]
+
+
+def summarize_chunked(text, pages=None):
+    """
+    Summarize long text by summarizing chunks concurrently, then combining them
+
+    Chunks follow page and section boundaries. At most SUMMARY_CONCURRENCY
+    chunk calls run at once and their estimated tokens in flight stay under
+    SUMMARY_TOKEN_BUDGET.
+
+    Returns:
+        dict: "success", "summary" and "error" like summarize_medical_text, plus
+            "chunks" (per-chunk timings) and "reduce_seconds"
+    """
+    chunks = make_chunks(text, pages)
+    logger.info(f"Summarizing {len(chunks)} chunks ({estimate_tokens(text)} estimated tokens)")
+
+    executor = get_chunk_executor()
+    futures = [executor.submit(_summarize_chunk, index, chunk) for index, chunk in enumerate(chunks)]
+    results = [future.result() for future in futures]
+    chunk_info = [info for _, info in results]
+
+    parts = []
+    for (result, _), chunk in zip(results, chunks):
+        if result["success"]:
+            pages_label = (f"Page {chunk['first_page']}" if chunk['first_page'] == chunk['last_page']
+                           else f"Pages {chunk['first_page']}-{chunk['last_page']}")
+            parts.append(f"{pages_label}:\n{result['summary']}")
+
+    response = {"success": False, "summary": None, "error": None, "chunks": chunk_info, "reduce_seconds": 0.0}
+    if not parts:
+        response["error"] = "All chunk summaries failed"
+        return response
+
+    failed = len(chunks) - len(parts)
+    start = time.perf_counter()
+    try:
+        response["summary"] = _combine(parts) if len(parts) > 1 else parts[0]
+        response["success"] = True
+        if failed:
+            response["error"] = f"{failed} of {len(chunks)} chunks could not be summarized"
+    except Exception as e:
+        response["error"] = str(e)
+    response["reduce_seconds"] = round(time.perf_counter() - start, 3)
+    return response
@@ -0,0 +1,113 @@
+import os
+import re
+import math
+from collections import Counter
+
+from app.chunked_summary import SECTION_HEADING
+from app.medication_extractor import find_drugs
+
+# Number of sentences kept in a local summary
+SUMMARY_FALLBACK_SENTENCES = int(os.getenv('SUMMARY_FALLBACK_SENTENCES', '8'))
+
+SUMMARY_FALLBACK_HEADER = "Key points (extracted locally because the AI summary was not available):"
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9(])')
+WORD = re.compile(r'[a-z][a-z\-]{2,}')
+DOSAGE = re.compile(r'\d+(?:\.\d+)?\s*(?:mg|mcg|g|ml|units?|iu|mmhg|mg/dl|%)\b', re.IGNORECASE)
+# Words that mark clinically important sentences, weighted above plain term frequency
+CLINICAL_CUES = re.compile(
+    r'\b(?:diagnos\w*|impression|assessment|plan|medications?|prescri\w*|allerg\w*|follow[\s-]?up|return|'
+    r'abnormal|elevated|positive|negative|history|symptoms?|treatment|recommend\w*|advised|target)\b',
+    re.IGNORECASE)
+STOPWORDS = frozenset("""
+about above after again against all also and any are because been before being below between both but
+can could did does doing down during each few for from further had has have having her here hers him his
+how into its itself just more most not now off once only other our out over own per please same she should
+some such than that the their them then there these they this those through too under until very was were
+what when where which while who whom why will with would you your patient take tablet tablets daily
+""".split())
+
+
+def split_sentences(text):
+    """
+    Split OCR text into sentences
+
+    Lines wrapped mid-sentence are joined back together; section headings
+    and blank lines end a sentence.
+
+    Returns:
+        list: (section heading or None, sentence) pairs in document order
+    """
+    sentences = []
+    section = None
+    pending = []
+
+    def flush():
+        if pending:
+            for sentence in SENTENCE_END.split(" ".join(pending)):
+                sentence = sentence.strip(' -*•')
+                if len(sentence.split()) >= 3:
+                    sentences.append((section, sentence))
+            pending.clear()
+
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            flush()
+        elif SECTION_HEADING.match(stripped):
+            flush()
+            section = stripped.rstrip(':').strip()
+        elif re.match(r'^(?:[-*•]|\d+[.)])\s', stripped):
+            # List items are sentences of their own
+            flush()
+            pending.append(stripped)
+        else:
+            pending.append(stripped)
+    flush()
+    return sentences
+
+
+def score_sentences(sentences):
+    """Score sentences by document term frequency plus dosage, drug and clinical cue bonuses"""
+    words = [WORD.findall(sentence.lower()) for _, sentence in sentences]
+    frequencies = Counter(word for sentence_words in words for word in sentence_words if word not in STOPWORDS)
+    top = max(frequencies.values(), default=1)
+
+    scores = []
+    for index, ((section, sentence), sentence_words) in enumerate(zip(sentences, words)):
+        content = {word for word in sentence_words if word not in STOPWORDS}
+        score = sum(frequencies[word] / top for word in content) / math.sqrt(len(sentence_words) or 1)
+        score += 0.5 * min(len(CLINICAL_CUES.findall(sentence)), 3)
+        score += 0.75 * min(len(DOSAGE.findall(sentence)), 2)
+        score += 1.0 * min(len(find_drugs(sentence)), 2)
+        if section and CLINICAL_CUES.search(section):
+            score += 0.5
+        # Documents tend to state the reason for the visit early
+        score += 0.3 * (1 - index / len(sentences))
+        scores.append(score)
+    return scores
+
+
+def extractive_summary(text, max_sentences=SUMMARY_FALLBACK_SENTENCES):
+    """
+    Summarize text locally by picking its highest-scoring sentences
+
+    No network calls; used when the AI summary fails or misses its latency budget.
+
+    Returns:
+        dict: "success", "summary" (the picked sentences as a bulleted list in
+            document order) and "error"
+    """
+    sentences = split_sentences(text or "")
+    if not sentences:
+        return {"success": False, "summary": None, "error": "No text to summarize"}
+
+    scores = score_sentences(sentences)
+    ranked = sorted(range(len(sentences)), key=lambda index: scores[index], reverse=True)
+    picked = sorted(ranked[:max_sentences])
+
+    lines = [SUMMARY_FALLBACK_HEADER]
+    for index in picked:
+        section, sentence = sentences[index]
+        lines.append(f"- {section.title()}: {sentence}" if section else f"- {sentence}")
+    return {"success": True, "summary": "\n".join(lines), "error": None}
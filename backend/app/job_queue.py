@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('job_queue')
+
+# Job queue configuration
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_TTL_SECONDS = int(os.getenv('JOB_TTL_SECONDS', '600'))
+JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', '100'))
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '4'))
+
+
+class QueueFullError(Exception):
+    """Raised when too many jobs are already waiting for a worker"""
+
+
+class Job:
+    """A unit of background work and its outcome"""
+
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = 'queued'
+        self.result = None
+        self.http_status = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class JobQueue:
+    """
+    Bounded worker pool that runs jobs in the background
+
+    Jobs are deduplicated by key: submitting a key that already has a queued,
+    running or unexpired finished job returns that job instead of starting a
+    new one (failed jobs can be resubmitted). Finished jobs are dropped once
+    they are older than the TTL.
+
+    Args:
+        max_workers: Number of worker threads
+        ttl: Seconds a finished job (and its result) is kept
+        max_pending: Maximum number of jobs that may wait for a worker
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, ttl=JOB_TTL_SECONDS, max_pending=JOB_MAX_PENDING):
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job-worker')
+        self._jobs = {}
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) unless an equivalent job already exists
+
+        fn must return a (response body, HTTP status) tuple.
+
+        Returns:
+            tuple: (Job, bool) - the job and whether it was newly created
+        """
+        with self._lock:
+            self._purge_expired()
+            existing = self._by_key.get(key)
+            if existing is not None and existing.status != 'failed':
+                return existing, False
+
+            pending = sum(1 for job in self._jobs.values() if job.status == 'queued')
+            if pending >= self.max_pending:
+                raise QueueFullError(f"Too many queued jobs ({pending}), try again later")
+
+            job = Job(key)
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        logger.info(f"Queued job {job.id}")
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            self._purge_expired()
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def _run(self, job, fn, args, kwargs):
+        job.started_at = time.time()
+        job.status = 'running'
+        try:
+            body, http_status = fn(*args, **kwargs)
+            job.result = body
+            job.http_status = http_status
+            if http_status >= 400:
+                job.error = body.get('message') if isinstance(body, dict) else None
+                status = 'failed'
+            else:
+                status = 'done'
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            job.http_status = 500
+            status = 'failed'
+        # Set the finish time first so TTL purging never sees a finished job without one
+        job.finished_at = time.time()
+        job.status = status
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Return the process-wide document job queue, creating it on first use"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
+
+
+_batch_executor = None
+
+
+def get_batch_executor():
+    """Return the thread pool shared by all batch uploads, creating it on first use"""
+    global _batch_executor
+    if _batch_executor is None:
+        with _queue_lock:
+            if _batch_executor is None:
+                _batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch-worker')
+    return _batch_executor
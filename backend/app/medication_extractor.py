@@ -0,0 +1,334 @@
+import os
+import re
+import threading
+import time
+import calendar
+import logging
+from collections import deque
+from datetime import date, datetime, timedelta
+
+# Optional C implementation of the Aho-Corasick automaton
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+logger = logging.getLogger('medication_extractor')
+
+DRUG_LEXICON = os.getenv('DRUG_LEXICON', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'data', 'drug_lexicon.txt'))
+
+# How far past a drug name its strength and directions are looked for
+MEDICATION_WINDOW_LINES = 3
+MEDICATION_WINDOW_CHARS = 300
+
+STRENGTH = re.compile(
+    r'(?<![\w.])(\d+(?:[.,]\d+)?(?:\s*/\s*\d+(?:\.\d+)?)?)\s*'
+    r'(mcg|µg|mg|meq|g|ml|units?|iu|%)(?:\s*/\s*(\d*\s*(?:ml|tab(?:let)?|dose|hr|h)))?(?![a-z])',
+    re.IGNORECASE)
+
+# (pattern, normalized frequency or None to use the matched text)
+FREQUENCIES = [
+    (re.compile(r'\b(?:once|twice|three times|four times|[1-4]\s*(?:x|times))\s+(?:a\s+|per\s+|each\s+)?'
+                r'(?:daily|day|weekly|week|monthly|month)\b', re.IGNORECASE), None),
+    (re.compile(r'\bevery\s+(?:other\s+)?\d*(?:\s*(?:-|to)\s*\d+)?\s*(?:hours?|hrs?|days?|weeks?|months?|'
+                r'morning|evening|night|day|week)\b', re.IGNORECASE), None),
+    (re.compile(r'\b(?:at bedtime|before bed(?:time)?|in the morning|in the evening|as needed)\b', re.IGNORECASE), None),
+    (re.compile(r'\bq\.?\s?d\.?(?!\w)', re.IGNORECASE), "once daily"),
+    (re.compile(r'\bb\.?\s?i\.?\s?d\.?(?!\w)', re.IGNORECASE), "twice daily"),
+    (re.compile(r'\bt\.?\s?i\.?\s?d\.?(?!\w)', re.IGNORECASE), "three times daily"),
+    (re.compile(r'\bq\.?\s?i\.?\s?d\.?(?!\w)', re.IGNORECASE), "four times daily"),
+    (re.compile(r'\bq\.?\s?h\.?\s?s\.?(?!\w)', re.IGNORECASE), "at bedtime"),
+    (re.compile(r'\bp\.?\s?r\.?\s?n\.?(?!\w)', re.IGNORECASE), "as needed"),
+    (re.compile(r'\bq\s?(\d+)\s?h\b', re.IGNORECASE), "every {0} hours"),
+    (re.compile(r'\b(?:daily|nightly|weekly|monthly)\b', re.IGNORECASE), None)
+]
+
+FOLLOW_UP_HEADING = re.compile(r'^\s*follow[\s-]?up\b.*:\s*$', re.IGNORECASE)
+FOLLOW_UP_KEYWORDS = re.compile(
+    r'\b(?:follow[\s-]?up|return|recheck|re-check|revisit|appointment|see (?:you|me|doctor|clinic))\b', re.IGNORECASE)
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+                "seven": 7, "eight": 8, "nine": 9, "ten": 10, "twelve": 12, "a": 1, "an": 1}
+FOLLOW_UP_INTERVAL = re.compile(
+    r'\bin\s+(\d+|one|two|three|four|five|six|seven|eight|nine|ten|twelve|an?)\s*'
+    r'(days?|weeks?|months?|years?)\b', re.IGNORECASE)
+DATE_PATTERN = re.compile(
+    r'\b(\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{2}-\d{2}|'
+    r'(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4})\b', re.IGNORECASE)
+DOCUMENT_DATE = re.compile(r'^\s*date(?: of (?:visit|service))?\s*:\s*(.+)$', re.IGNORECASE | re.MULTILINE)
+DATE_FORMATS = ['%m/%d/%Y', '%Y-%m-%d', '%B %d, %Y', '%B %d %Y', '%b %d, %Y', '%b %d %Y', '%b. %d, %Y']
+
+
+class _Automaton:
+    """
+    Pure-Python Aho-Corasick automaton with the subset of the pyahocorasick
+    Automaton interface used here (add_word, make_automaton, iter)
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+    def add_word(self, word, value):
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state].append(value)
+
+    def make_automaton(self):
+        # Breadth-first, so each state's failure link is final before its children's
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, child in self._goto[state].items():
+                pending.append(child)
+                if state == 0:
+                    continue  # Depth-one states fail back to the root
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def iter(self, text):
+        """Yield (end index, value) for every lexicon word found in text"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for value in output[state]:
+                yield index, value
+
+
+def load_lexicon(path=DRUG_LEXICON):
+    """
+    Read the drug lexicon
+
+    Returns:
+        dict: lowercase name or synonym -> generic drug name
+    """
+    names = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            generic, _, synonyms = line.partition(':')
+            generic = generic.strip().lower()
+            names[generic] = generic
+            for synonym in synonyms.split(','):
+                if synonym.strip():
+                    names[synonym.strip().lower()] = generic
+    return names
+
+
+_automaton = None
+_automaton_lock = threading.Lock()
+
+
+def get_automaton():
+    """Return the drug name automaton, building it from the lexicon on first use"""
+    global _automaton
+    if _automaton is None:
+        with _automaton_lock:
+            if _automaton is None:
+                start = time.perf_counter()
+                automaton = ahocorasick.Automaton() if ahocorasick is not None else _Automaton()
+                for name, generic in load_lexicon().items():
+                    automaton.add_word(name, (name, generic))
+                automaton.make_automaton()
+                logger.info(f"Built drug automaton ({'pyahocorasick' if ahocorasick is not None else 'python'}) "
+                            f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+                _automaton = automaton
+    return _automaton
+
+
+def _lower(text):
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # A few characters lowercase to more than one; keep offsets aligned with text
+    return "".join(char if len(char.lower()) != 1 else char.lower() for char in text)
+
+
+def find_drugs(text):
+    """
+    Find whole-word drug names in text, longest match first where they overlap
+
+    Returns:
+        list: (start, end, generic name) tuples in text order
+    """
+    lowered = _lower(text)
+    matches = []
+    for end, (name, generic) in get_automaton().iter(lowered):
+        start = end - len(name) + 1
+        if start > 0 and lowered[start - 1].isalnum():
+            continue
+        if end + 1 < len(lowered) and lowered[end + 1].isalnum():
+            continue
+        matches.append((start, end + 1, generic))
+
+    matches.sort(key=lambda match: (match[0], match[0] - match[1]))
+    drugs = []
+    for match in matches:
+        if drugs and match[0] < drugs[-1][1]:
+            continue
+        drugs.append(match)
+    return drugs
+
+
+def _frequency(window):
+    best = None
+    for pattern, normalized in FREQUENCIES:
+        match = pattern.search(window)
+        if match and (best is None or match.start() < best[0]):
+            value = normalized.format(*match.groups()) if normalized else " ".join(match.group(0).lower().split())
+            best = (match.start(), value)
+    return best[1] if best else None
+
+
+def _strength(window):
+    match = STRENGTH.search(window)
+    if not match:
+        return None
+    amount, unit, per = match.groups()
+    unit = 'mcg' if unit.lower() == 'µg' else unit.lower()
+    strength = f"{amount.replace(' ', '')}{unit}" if unit == '%' else f"{amount.replace(' ', '')} {unit}"
+    return f"{strength}/{per.strip().lower()}" if per else strength
+
+
+def _window(text, start, limit):
+    """Text after a drug name up to the next drug, a blank line or the window size"""
+    window = text[start:min(limit, start + MEDICATION_WINDOW_CHARS)]
+    lines = []
+    for index, line in enumerate(window.split('\n')[:MEDICATION_WINDOW_LINES]):
+        if index and not line.strip():
+            break
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def parse_date(value):
+    value = " ".join(value.strip().rstrip('.').split())
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _add_interval(start, count, unit):
+    unit = unit.lower().rstrip('s')
+    if unit == 'day':
+        return start + timedelta(days=count)
+    if unit == 'week':
+        return start + timedelta(weeks=count)
+    months = count * 12 if unit == 'year' else count
+    year, month = divmod(start.month - 1 + months, 12)
+    year += start.year
+    day = min(start.day, calendar.monthrange(year, month + 1)[1])
+    return date(year, month + 1, day)
+
+
+def document_date(text):
+    """Return the date the document was written (its first "Date:" line), or None"""
+    for match in DOCUMENT_DATE.finditer(text):
+        found = DATE_PATTERN.search(match.group(1))
+        if found:
+            parsed = parse_date(found.group(0))
+            if parsed:
+                return parsed
+    return None
+
+
+def find_follow_ups(text):
+    """
+    Find follow-up instructions: lines under a FOLLOW-UP heading or mentioning
+    a return visit, with their interval ("in 3 months") or explicit date
+
+    Returns:
+        list: dicts with text, interval and date (ISO date, counted from the
+            document date when only an interval is given)
+    """
+    written = document_date(text)
+    follow_ups = []
+    in_section = False
+    for line in text.split('\n'):
+        stripped = line.strip()
+        if FOLLOW_UP_HEADING.match(line):
+            in_section = True
+            continue
+        if not stripped:
+            in_section = False
+            continue
+        if not in_section and not FOLLOW_UP_KEYWORDS.search(stripped):
+            continue
+
+        interval = FOLLOW_UP_INTERVAL.search(stripped)
+        explicit = DATE_PATTERN.search(stripped)
+        if not interval and not explicit:
+            continue
+        due = parse_date(explicit.group(0)) if explicit else None
+        if due is None and interval and written is not None:
+            count = interval.group(1).lower()
+            due = _add_interval(written, int(count) if count.isdigit() else NUMBER_WORDS[count], interval.group(2))
+        follow_ups.append({
+            "text": stripped,
+            "interval": " ".join(interval.group(0).split()[1:]).lower() if interval else None,
+            "date": due.isoformat() if due else None
+        })
+    return follow_ups
+
+
+def extract_medications(text):
+    """
+    Extract medications and follow-up dates from OCR text without calling the AI service
+
+    Drug names are matched against the bundled lexicon with an Aho-Corasick
+    automaton; strength and frequency are read from the text that follows
+    each name.
+
+    Returns:
+        dict: "medications" (drug, matched, strength, frequency, line),
+            "follow_up", "engine" and "ms"
+    """
+    start = time.perf_counter()
+    text = text or ""
+    drugs = find_drugs(text)
+    medications = {}
+    for index, (drug_start, drug_end, generic) in enumerate(drugs):
+        limit = drugs[index + 1][0] if index + 1 < len(drugs) else len(text)
+        window = _window(text, drug_end, limit)
+        medication = {
+            "drug": generic,
+            "matched": text[drug_start:drug_end],
+            "strength": _strength(window),
+            "frequency": _frequency(window),
+            "line": text[text.rfind('\n', 0, drug_start) + 1:drug_end] + window.split('\n', 1)[0]
+        }
+        medication["line"] = medication["line"].strip()
+        existing = medications.get(generic)
+        if existing is None:
+            medications[generic] = medication
+        else:
+            # A drug mentioned again (e.g. in the notes) only fills in what's missing
+            for key in ("strength", "frequency"):
+                existing[key] = existing[key] or medication[key]
+
+    return {
+        "medications": list(medications.values()),
+        "follow_up": find_follow_ups(text),
+        "engine": 'pyahocorasick' if ahocorasick is not None else 'python',
+        "ms": round((time.perf_counter() - start) * 1000, 2)
+    }
@@ -0,0 +1,137 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds, from fast cache lookups to slow
+# multi-page OCR and model calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stage timings of the request being handled in this context (None outside requests)
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, le=None):
+    """Format a label set, adding the bucket bound when given"""
+    if le is not None:
+        labels = labels + ['le="%s"' % le]
+    return "{%s}" % ",".join(labels) if labels else ""
+
+
+class Histogram:
+    """
+    Thread-safe Prometheus-style histogram with labels
+
+    Args:
+        name: Metric name
+        help_text: Description shown on /metrics
+        labelnames: Names of the labels each observation carries
+        buckets: Bucket upper bounds, ascending
+    """
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            if index < len(self.buckets):
+                series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        """Return the histogram in the Prometheus text exposition format"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: dict(value, counts=list(value["counts"])) for key, value in self._series.items()}
+        for key, value in sorted(series.items()):
+            labels = [f'{name}="{_escape(label)}"' for name, label in zip(self.labelnames, key)]
+            cumulative = 0
+            for bound, count in zip(self.buckets, value["counts"]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(labels, bound)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(labels, '+Inf')} {value['count']}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {value['sum']}")
+            lines.append(f"{self.name}_count{_labels(labels)} {value['count']}")
+        return "\n".join(lines)
+
+
+STAGE_SECONDS = Histogram(
+    'medivault_stage_seconds', 'Latency of document pipeline and notification stages', ['stage'])
+REQUEST_SECONDS = Histogram(
+    'medivault_http_request_seconds', 'Latency of HTTP requests', ['method', 'endpoint', 'status'])
+
+HISTOGRAMS = [STAGE_SECONDS, REQUEST_SECONDS]
+
+
+def observe_stage(stage, seconds):
+    """Record a stage duration, and add it to the current request's timings if there is one"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        total, count = timings.get(stage, (0.0, 0))
+        timings[stage] = (total + seconds, count + 1)
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as a pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+def begin_request():
+    """Start collecting stage timings for the request handled in this context"""
+    return _request_timings.set({})
+
+
+def end_request(token):
+    """
+    Stop collecting stage timings for the current request
+
+    Returns:
+        dict: stage name -> (total seconds, number of observations)
+    """
+    timings = _request_timings.get() or {}
+    try:
+        _request_timings.reset(token)
+    except ValueError:
+        # The token belongs to another context (e.g. a streamed response)
+        _request_timings.set(None)
+    return timings
+
+
+def server_timing_header(timings, total=None):
+    """Format stage timings as a Server-Timing header value"""
+    entries = []
+    for name, (seconds, count) in timings.items():
+        entry = f"{name};dur={seconds * 1000:.1f}"
+        if count > 1:
+            entry += f';desc="{count} calls"'
+        entries.append(entry)
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def render_metrics():
+    """Return all histograms in the Prometheus text exposition format"""
+    return "\n".join(histogram.render() for histogram in HISTOGRAMS) + "\n"
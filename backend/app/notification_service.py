@@ -0,0 +1,48 @@
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('notification_service')
+
+# Notification dispatch configuration
+NOTIFY_WORKERS = int(os.getenv('NOTIFY_WORKERS', '16'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_notify_executor():
+    """Return the thread pool shared by all notification dispatches, creating it on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=NOTIFY_WORKERS, thread_name_prefix='notify-worker')
+    return _executor
+
+
+def send_sms(client, from_number, contact, body):
+    message = client.messages.create(
+        body=body,
+        from_=from_number,
+        to=contact.get('phoneNumber')
+    )
+    return {
+        "contact": contact.get('name'),
+        "sid": message.sid,
+        "status": "sent"
+    }
+
+
+def place_call(client, from_number, contact, twiml):
+    call = client.calls.create(
+        twiml=twiml,
+        to=contact.get('phoneNumber'),
+        from_=from_number
+    )
+    return {
+        "sid": call.sid,
+        "status": "initiated",
+        "contact": contact.get('name')
+    }
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import threading
+import logging
+
+from app import metrics
+from app.cache import LRUCache, DiskCache
+from app.ocr_service import extract_text, ocr_settings
+from app.uploads import spool
+
+logger = logging.getLogger('ocr_cache')
+
+# Cache configuration (sizes in megabytes)
+OCR_CACHE_MEMORY_MB = int(os.getenv('OCR_CACHE_MEMORY_MB', '64'))
+OCR_CACHE_DISK = os.getenv('OCR_CACHE_DISK', 'false').lower() in ('1', 'true', 'yes')
+OCR_CACHE_DISK_MB = int(os.getenv('OCR_CACHE_DISK_MB', '512'))
+OCR_CACHE_DIR = os.getenv(
+    'OCR_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'ocr_cache')
+)
+
+
+def content_hash(data):
+    """Return the SHA-256 hex digest of the uploaded bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def settings_hash(settings):
+    """Return a short stable digest of the OCR settings"""
+    encoded = json.dumps(settings, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class OCRCache:
+    """
+    Content-addressed cache of OCR results
+
+    Keys are "<sha256 of the document>-<digest of the OCR settings>", so the
+    same upload processed with different Tesseract or preprocessing settings
+    is cached separately, and all variants of a document can be invalidated
+    by its content hash.
+    """
+
+    def __init__(self, memory_bytes, disk_dir=None, disk_bytes=0):
+        self.memory = LRUCache(memory_bytes)
+        self.disk = DiskCache(disk_dir, disk_bytes) if disk_dir else None
+
+    @staticmethod
+    def make_key(data_hash, settings):
+        return f"{data_hash}-{settings_hash(settings)}"
+
+    def get(self, key):
+        result = self.memory.get(key)
+        if result is not None:
+            return result
+        if self.disk is not None:
+            result = self.disk.get(key)
+            if result is not None:
+                # Promote to the memory tier for subsequent hits
+                self.memory.set(key, result)
+                return result
+        return None
+
+    def put(self, key, result):
+        self.memory.set(key, result)
+        if self.disk is not None:
+            self.disk.set(key, result)
+
+    def invalidate(self, data_hash=None):
+        """
+        Remove cached results for one document, or everything if no hash is given
+
+        Returns:
+            int: Number of entries removed across both tiers
+        """
+        if data_hash is None:
+            removed = self.memory.clear()
+            if self.disk is not None:
+                removed += self.disk.clear()
+        else:
+            prefix = f"{data_hash}-"
+            removed = self.memory.delete_where(lambda key: key.startswith(prefix))
+            if self.disk is not None:
+                removed += self.disk.delete_where(lambda key: key.startswith(prefix))
+        logger.info(f"Invalidated {removed} OCR cache entries")
+        return removed
+
+    def stats(self):
+        return {
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache():
+    """Return the process-wide OCR cache, creating it on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OCRCache(
+                    OCR_CACHE_MEMORY_MB * 1024 * 1024,
+                    disk_dir=OCR_CACHE_DIR if OCR_CACHE_DISK else None,
+                    disk_bytes=OCR_CACHE_DISK_MB * 1024 * 1024
+                )
+    return _cache
+
+
+def upload_name(file_obj):
+    """Return the client filename of an upload or the path of an open file"""
+    return getattr(file_obj, 'filename', None) or getattr(file_obj, 'name', 'unknown')
+
+
+def cached_extract_text(file_obj, cache=None, dpi=None, progress=None):
+    """
+    Extract text through the OCR cache
+
+    Args:
+        file_obj: Werkzeug FileStorage, SpooledUpload or file object opened in
+            binary mode (rb); spooled uploads are hashed and OCR'd without
+            another copy
+        cache: Optional OCRCache (defaults to the process-wide cache)
+        dpi: Optional render resolution for OCR'd PDF pages
+        progress: Optional callback(event, data) for page progress (not called on cache hits)
+
+    Returns:
+        dict: The extract_text result, plus "content_hash" and "cached"
+    """
+    cache = cache or get_ocr_cache()
+    name = upload_name(file_obj)
+    with metrics.stage("upload_read"):
+        upload, owned = spool(file_obj, name)
+    try:
+        data_hash = upload.content_hash
+        settings = ocr_settings()
+        if dpi:
+            settings["pdf_dpi"] = dpi
+        key = cache.make_key(data_hash, settings)
+
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info(f"OCR cache hit for {name} ({data_hash[:12]})")
+            result = dict(cached)
+            result["source"] = name
+            result["cached"] = True
+            return result
+
+        # extract_text picks the PDF or image path from the upload's file name
+        result = extract_text(upload, dpi=dpi, progress=progress)
+    finally:
+        if owned:
+            upload.close()
+    result["content_hash"] = data_hash
+    if result["success"]:
+        cache.put(key, dict(result))
+    result["cached"] = False
+    return result
@@ -1,16 +1,96 @@
 import pytesseract
-import fitz  # PyMuPDF
 import io
+import json
+import shutil
 from PIL import Image
 import os
-import tempfile
 import platform
 import logging
+import threading
+import time
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from app import preprocessing, metrics
+from app.uploads import SpooledUpload
+
+# Optional Tesseract C API bindings for the warm engine pool
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('ocr_service')
 
+# Tesseract settings used for every OCR pass. Bump PREPROCESS_VERSION whenever
+# the image preprocessing changes so cached results from the old pipeline are
+# not served for new requests.
+TESSERACT_OEM = 3
+TESSERACT_PSM = 6
+TESSERACT_SPARSE_PSM = 11
+PREPROCESS_VERSION = 3
+
+# OCR backend: 'pytesseract' (a tesseract subprocess per image) or 'tesserocr'
+# (a pool of long-lived engines using the Tesseract C API)
+OCR_BACKEND = os.getenv('OCR_BACKEND', 'pytesseract').lower()
+OCR_ENGINE_POOL_SIZE = int(os.getenv('OCR_ENGINE_POOL_SIZE', '0')) or os.cpu_count() or 1
+OCR_LANGUAGE = os.getenv('OCR_LANGUAGE', 'eng')
+
+# How extract_from_image handles hard images:
+#   'sequential' - PSM 6, then a full PSM 11 pass if it yields almost nothing
+#   'confidence' - one PSM 6 pass with word confidences, then one more pass
+#                  over just the low-confidence lines, stacked into a strip
+#   'race'       - run PSM 6 and PSM 11 in parallel and keep the higher scoring
+OCR_RETRY_MODE = os.getenv('OCR_RETRY_MODE', 'confidence').lower()
+OCR_MIN_CONFIDENCE = float(os.getenv('OCR_MIN_CONFIDENCE', '60'))
+# White space between lines stacked for the re-OCR pass
+REOCR_LINE_GAP = 16
+
+# Number of worker processes used to OCR scanned PDF pages in parallel
+OCR_PAGE_WORKERS = int(os.getenv('OCR_PAGE_WORKERS', '0')) or os.cpu_count() or 1
+# How pool workers are started. The server runs threads (outbox sender,
+# warm-up, thread pools) by the time the pool starts, and forking a threaded
+# process can deadlock the child on a lock another thread held, so workers
+# come from a fork server (spawn on platforms without one)
+OCR_POOL_START_METHOD = os.getenv('OCR_POOL_START_METHOD') or (
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+# Decode, preprocess and OCR images on the page pool too, instead of in the
+# request thread (the production server turns this on, see asgi.py)
+OCR_IMAGES_IN_PROCESS_POOL = os.getenv('OCR_IMAGES_IN_PROCESS_POOL', 'false').lower() == 'true'
+
+# Resolution PDF pages are rendered at for OCR (overridable per request)
+OCR_PDF_DPI = int(os.getenv('OCR_PDF_DPI', '200'))
+MIN_PDF_DPI = 50
+MAX_PDF_DPI = 600
+
+# Minimum non-whitespace characters for a PDF page's text layer to be used
+# instead of OCR
+PDF_TEXT_LAYER_MIN_CHARS = int(os.getenv('PDF_TEXT_LAYER_MIN_CHARS', '20'))
+
+def ocr_settings():
+    """Return the settings that influence OCR output (used as part of cache keys)"""
+    return {
+        "oem": TESSERACT_OEM,
+        "psm": TESSERACT_PSM,
+        "sparse_psm": TESSERACT_SPARSE_PSM,
+        "preprocess_version": PREPROCESS_VERSION,
+        "preprocess_stages": preprocessing.DEFAULT_STAGES,
+        "target_text_height": preprocessing.OCR_TARGET_TEXT_HEIGHT,
+        "max_dimension": preprocessing.OCR_MAX_DIMENSION,
+        "decode_max_pixels": preprocessing.OCR_DECODE_MAX_PIXELS,
+        "pdf_text_layer_min_chars": PDF_TEXT_LAYER_MIN_CHARS,
+        "pdf_dpi": OCR_PDF_DPI,
+        "backend": OCR_BACKEND,
+        "retry_mode": OCR_RETRY_MODE,
+        "min_confidence": OCR_MIN_CONFIDENCE,
+        "language": OCR_LANGUAGE
+    }
+
 # Set Tesseract path based on OS
 def setup_tesseract():
     """Configure Tesseract path based on operating system"""
@@ -77,24 +157,251 @@ def setup_tesseract():
     # For Linux, usually in PATH, but could check common locations
     return True
 
-# Initialize Tesseract
-tesseract_available = setup_tesseract()
-if tesseract_available:
+# Tesseract discovery is deferred until OCR is first needed (or warm_up runs)
+# so importing this module stays cheap. The version check spawns a
+# subprocess, so its result is also cached on disk per executable.
+TESSERACT_DISCOVERY_CACHE = os.getenv('TESSERACT_DISCOVERY_CACHE', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static/tesseract.json'))
+
+_tesseract_status = None
+_tesseract_lock = threading.Lock()
+
+def _read_discovery_cache(path):
+    """Return the cached version of the executable at path, if it hasn't changed since"""
     try:
-        version = pytesseract.get_tesseract_version()
-        logger.info(f"Tesseract version: {version}")
-    except Exception as e:
-        logger.error(f"Failed to get Tesseract version: {str(e)}")
-        tesseract_available = False
-else:
-    logger.warning("Tesseract not properly configured")
+        with open(TESSERACT_DISCOVERY_CACHE) as f:
+            cached = json.load(f)
+        if cached.get("path") == path and cached.get("mtime") == os.path.getmtime(path):
+            return cached.get("version")
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _write_discovery_cache(path, version):
+    try:
+        os.makedirs(os.path.dirname(TESSERACT_DISCOVERY_CACHE), exist_ok=True)
+        with open(TESSERACT_DISCOVERY_CACHE, 'w') as f:
+            json.dump({"path": path, "mtime": os.path.getmtime(path), "version": version}, f)
+    except OSError as e:
+        logger.warning(f"Could not write Tesseract discovery cache: {str(e)}")
+
+def _discover_tesseract():
+    status = {"available": False, "path": None, "version": None, "cached": False, "error": None}
+    if not setup_tesseract():
+        status["error"] = "Tesseract not properly configured"
+        logger.warning(status["error"])
+        return status
+    
+    cmd = pytesseract.pytesseract.tesseract_cmd
+    path = cmd if os.path.isabs(cmd) else shutil.which(cmd)
+    status["path"] = path or cmd
+    if not path or not os.path.exists(path):
+        status["error"] = f"{cmd} is not installed or it's not in your PATH"
+        logger.error(f"Failed to find Tesseract: {status['error']}")
+        return status
+    
+    version = _read_discovery_cache(path)
+    if version is not None:
+        status["cached"] = True
+    else:
+        try:
+            version = str(pytesseract.get_tesseract_version())
+        except Exception as e:
+            status["error"] = str(e)
+            logger.error(f"Failed to get Tesseract version: {str(e)}")
+            return status
+        _write_discovery_cache(path, version)
+    
+    status["version"] = version
+    status["available"] = True
+    logger.info(f"Tesseract version: {version} ({path})")
+    return status
 
-def extract_text(file_obj):
+def tesseract_status(refresh=False):
+    """
+    Locate Tesseract and read its version, once per process
+    
+    Args:
+        refresh: Probe again instead of returning the remembered result
+    
+    Returns:
+        dict: "available", "path", "version", "cached" (version read from the
+            discovery cache) and "error"
+    """
+    global _tesseract_status
+    if _tesseract_status is None or refresh:
+        with _tesseract_lock:
+            if _tesseract_status is None or refresh:
+                _tesseract_status = _discover_tesseract()
+    return _tesseract_status
+
+def is_tesseract_available():
+    return tesseract_status()["available"]
+
+class PytesseractBackend:
+    """Runs the tesseract executable once per image through pytesseract"""
+    
+    name = 'pytesseract'
+    
+    def image_to_string(self, image, psm):
+        config = f'--oem {TESSERACT_OEM} --psm {psm}'
+        return pytesseract.image_to_string(image, lang=OCR_LANGUAGE, config=config)
+    
+    def image_to_data(self, image, psm):
+        config = f'--oem {TESSERACT_OEM} --psm {psm}'
+        data = pytesseract.image_to_data(image, lang=OCR_LANGUAGE, config=config,
+                                         output_type=pytesseract.Output.DICT)
+        words = []
+        for i, word in enumerate(data["text"]):
+            conf = float(data["conf"][i])
+            if conf < 0 or not word.strip():
+                continue
+            words.append({
+                "text": word,
+                "conf": conf,
+                "line": (data["block_num"][i], data["par_num"][i], data["line_num"][i]),
+                "box": (data["left"][i], data["top"][i],
+                        data["left"][i] + data["width"][i], data["top"][i] + data["height"][i])
+            })
+        return words
+    
+    def warm_up(self):
+        # Pull the executable and traineddata into the OS page cache
+        self.image_to_string(Image.new('L', (8, 8), 255), TESSERACT_PSM)
+
+class TesserocrBackend:
+    """
+    Pool of long-lived Tesseract engines driven through the C API (tesserocr)
+    
+    Each engine loads the traineddata once and is reused for every image, so
+    there is no per-image process spawn, model load or temp file. Engines are
+    created on demand up to the pool size; warm_up() creates them all ahead
+    of time.
+    """
+    
+    name = 'tesserocr'
+    
+    def __init__(self, size):
+        self.size = size
+        self._engines = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+    
+    def _new_engine(self):
+        kwargs = {"lang": OCR_LANGUAGE, "oem": TESSERACT_OEM, "psm": TESSERACT_PSM}
+        if os.environ.get('TESSDATA_PREFIX'):
+            kwargs["path"] = os.environ['TESSDATA_PREFIX']
+        return tesserocr.PyTessBaseAPI(**kwargs)
+    
+    def _checkout(self):
+        try:
+            return self._engines.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._new_engine()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._engines.get()
+    
+    def image_to_string(self, image, psm):
+        engine = self._checkout()
+        try:
+            engine.SetPageSegMode(psm)
+            engine.SetImage(image)
+            return engine.GetUTF8Text()
+        finally:
+            engine.Clear()
+            self._engines.put(engine)
+    
+    def image_to_data(self, image, psm):
+        engine = self._checkout()
+        try:
+            engine.SetPageSegMode(psm)
+            engine.SetImage(image)
+            engine.Recognize()
+            words = []
+            iterator = engine.GetIterator()
+            level = tesserocr.RIL.WORD
+            block = para = line = 0
+            while iterator is not None:
+                if iterator.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+                    block += 1
+                if iterator.IsAtBeginningOf(tesserocr.RIL.PARA):
+                    para += 1
+                if iterator.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                    line += 1
+                word = iterator.GetUTF8Text(level)
+                box = iterator.BoundingBox(level)
+                if word and word.strip() and box:
+                    words.append({
+                        "text": word,
+                        "conf": iterator.Confidence(level),
+                        "line": (block, para, line),
+                        "box": box
+                    })
+                if not iterator.Next(level):
+                    break
+            return words
+        finally:
+            engine.Clear()
+            self._engines.put(engine)
+    
+    def warm_up(self):
+        engines = [self._checkout() for _ in range(self.size)]
+        for engine in engines:
+            self._engines.put(engine)
+        logger.info(f"Warmed up {len(engines)} Tesseract engines")
+
+_backend = None
+_backend_pid = None
+_backend_lock = threading.Lock()
+
+def _create_backend():
+    if OCR_BACKEND == 'tesserocr':
+        if tesserocr is None:
+            logger.warning("OCR_BACKEND=tesserocr but tesserocr is not installed, using pytesseract")
+        else:
+            try:
+                backend = TesserocrBackend(OCR_ENGINE_POOL_SIZE)
+                # Create one engine up front so configuration errors surface here
+                backend.image_to_string(Image.new('L', (8, 8), 255), TESSERACT_PSM)
+                return backend
+            except Exception as e:
+                logger.warning(f"Failed to start tesserocr engines, using pytesseract: {str(e)}")
+    elif OCR_BACKEND != 'pytesseract':
+        logger.warning(f"Unknown OCR_BACKEND '{OCR_BACKEND}', using pytesseract")
+    return PytesseractBackend()
+
+def get_ocr_backend():
+    """Return the configured OCR backend for this process"""
+    global _backend, _backend_pid
+    # Forked pool workers must not reuse engines created by the parent
+    if _backend is None or _backend_pid != os.getpid():
+        with _backend_lock:
+            if _backend is None or _backend_pid != os.getpid():
+                _backend = _create_backend()
+                _backend_pid = os.getpid()
+                logger.info(f"Using OCR backend: {_backend.name}")
+    return _backend
+
+def extract_text(file_obj, dpi=None, progress=None):
     """
     Extract text from images or PDF files
     
     Args:
         file_obj: File object opened in binary mode (rb)
+        dpi: Optional render resolution for OCR'd PDF pages (defaults to OCR_PDF_DPI)
+        progress: Optional callback(event, data) notified as each page completes
         
     Returns:
         dict: Dictionary with extracted text and metadata
@@ -107,35 +414,48 @@ def extract_text(file_obj):
         "text": "",
         "source": filename,
         "pages": 0,
+        "metadata": {},
         "success": False,
         "error": None
     }
     
     # Check if Tesseract is available
-    if not tesseract_available:
+    if not is_tesseract_available():
         logger.error("Tesseract OCR is not properly configured")
         result["error"] = "Tesseract OCR not found or not configured correctly. See README-OCR-TROUBLESHOOTING.md for help."
         return result
     
+    extract_image = extract_image_document_in_pool if OCR_IMAGES_IN_PROCESS_POOL else extract_image_document
     try:
         # Handle PDFs
         if extension == '.pdf':
             logger.info(f"Processing PDF file: {filename}")
-            text = extract_from_pdf(file_obj)
+            document = extract_pdf_document(file_obj, dpi=dpi, progress=progress)
+            text = document["text"]
             result["text"] = text
+            result["pages"] = len(document["pages"])
+            result["metadata"]["pages"] = document["pages"]
             
         # Handle images
         elif extension in ['.jpg', '.jpeg', '.png', '.tiff', '.bmp', '.gif']:
             logger.info(f"Processing image file: {filename}")
-            text = extract_from_image(file_obj)
+            document = extract_image(file_obj, progress=progress)
+            text = document["text"]
             result["text"] = text
+            result["metadata"]["ocr"] = document["ocr"]
+            result["metadata"]["preprocess"] = document["preprocess"]
+            result["metadata"]["decode"] = document["decode"]
             
         # Unknown file type    
         else:
             logger.info(f"Treating unknown file type as image: {filename}")
             # Try to process as image by default
-            text = extract_from_image(file_obj)
+            document = extract_image(file_obj, progress=progress)
+            text = document["text"]
             result["text"] = text
+            result["metadata"]["ocr"] = document["ocr"]
+            result["metadata"]["preprocess"] = document["preprocess"]
+            result["metadata"]["decode"] = document["decode"]
             
         # Check if any text was extracted
         if not text or len(text.strip()) < 5:
@@ -152,98 +472,526 @@ def extract_text(file_obj):
         result["error"] = f"OCR processing error: {str(e)}"
         return result
 
-def extract_from_pdf(file_obj):
+def extract_from_pdf(file_obj, dpi=None):
     """Extract text from a PDF file"""
+    return extract_pdf_document(file_obj, dpi=dpi)["text"]
+
+def extract_pdf_document(file_obj, dpi=None, progress=None):
+    """
+    Extract text from a PDF file, deciding per page between text layer and OCR
+    
+    Pages whose text layer has at least PDF_TEXT_LAYER_MIN_CHARS non-whitespace
+    characters use it directly; the remaining pages are rasterized at dpi
+    (defaults to OCR_PDF_DPI) and OCR'd.
+    
+    When a progress callback is given, it receives "page_text" for each text
+    layer page, and "page_rasterized" and "page_ocr" for each OCR'd page.
+    
+    Returns:
+        dict: "text" and "pages", a list with the path each page took
+    """
     try:
-        # Create a temporary file to save the PDF
-        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
-            temp_file.write(file_obj.read())
-            temp_path = temp_file.name
+        pdf_source = _pdf_source(file_obj)
+        doc = _open_pdf(pdf_source)
         
         try:
-            # Open the PDF with PyMuPDF
-            doc = fitz.open(temp_path)
-            text = ""
+            page_texts = []
+            pages = []
+            ocr_page_numbers = []
             
-            # Extract text from each page
+            # Use the text layer of each page that has one
             for page_num, page in enumerate(doc):
-                logger.info(f"Processing PDF page {page_num+1}")
-                page_text = page.get_text()
-                text += page_text
+                with metrics.stage("pdf_text_layer"):
+                    page_text = page.get_text()
+                layer_chars = len("".join(page_text.split()))
+                use_layer = layer_chars >= PDF_TEXT_LAYER_MIN_CHARS
+                logger.info(f"PDF page {page_num+1}: {layer_chars} text layer characters, "
+                            f"using {'text layer' if use_layer else 'OCR'}")
+                page_texts.append(page_text if use_layer else None)
+                if use_layer and progress:
+                    progress("page_text", {"page": page_num + 1, "method": "text_layer", "text": page_text})
+                pages.append({
+                    "page": page_num + 1,
+                    "dpi": None if use_layer else (dpi or OCR_PDF_DPI),
+                    "method": "text_layer" if use_layer else "ocr",
+                    "text_layer_chars": layer_chars
+                })
+                if not use_layer:
+                    ocr_page_numbers.append(page_num)
+            
+            # Rasterize and OCR only the pages without a usable text layer
+            if ocr_page_numbers and progress:
+                ocr_texts = _ocr_pdf_pages_with_progress(doc, ocr_page_numbers, dpi, progress)
+            elif ocr_page_numbers:
+                ocr_texts = ocr_pdf_pages(pdf_source, ocr_page_numbers, dpi=dpi)
+            if ocr_page_numbers:
+                for page_num, page_text in zip(ocr_page_numbers, ocr_texts):
+                    page_texts[page_num] = page_text + "\n\n"
             
-            # If PyMuPDF couldn't extract text or extracted very little, try OCR
-            if not text or len(text.strip()) < 20:
-                logger.info("PDF text extraction yielded little text, trying OCR...")
-                # Convert PDF to images and run OCR
-                text = ""
-                for page_num in range(len(doc)):
-                    page = doc.load_page(page_num)
-                    pix = page.get_pixmap()
-                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                    
-                    # Convert to grayscale for better OCR
-                    if img.mode != 'L':
-                        img = img.convert('L')
-                        
-                    # Use a better configuration for document OCR
-                    custom_config = r'--oem 3 --psm 6'
-                    page_text = pytesseract.image_to_string(img, config=custom_config)
-                    text += page_text + "\n\n"
-                    logger.info(f"OCR extracted {len(page_text)} characters from PDF page {page_num+1}")
+            for page_info, page_text in zip(pages, page_texts):
+                page_info["chars"] = len(page_text)
             
-            return text
+            return {"text": "".join(page_texts), "pages": pages}
         finally:
-            # Clean up the temporary file
-            try:
-                os.unlink(temp_path)
-            except Exception as e:
-                logger.warning(f"Failed to delete temporary PDF file: {str(e)}")
+            doc.close()
     except Exception as e:
         logger.error(f"PDF extraction error: {str(e)}")
         raise Exception(f"Failed to extract text from PDF: {str(e)}")
 
-def extract_from_image(file_obj):
-    """Extract text from an image file using pytesseract"""
+def _pdf_source(file_obj):
+    """
+    Return what PyMuPDF should open for an uploaded PDF without copying it
+    
+    Files that already live on disk (including spooled uploads) are opened by
+    path so MuPDF reads them directly. In-memory uploads are handed over as
+    their existing bytes: BytesIO.getvalue() shares the buffer it was created
+    from, and anything else is read exactly once.
+    
+    Returns:
+        str or bytes: A file path or the PDF bytes
+    """
+    # Werkzeug FileStorage wraps the real stream
+    stream = getattr(file_obj, 'stream', file_obj)
+    
+    if isinstance(stream, SpooledUpload):
+        return stream.source()
+    path = getattr(stream, 'name', None)
+    if isinstance(path, str) and os.path.isfile(path) and stream.tell() == 0:
+        return path
+    if isinstance(stream, io.BytesIO):
+        return stream.getvalue()
+    return stream.read()
+
+def _open_pdf(pdf_source):
+    """Open a PDF from a path or from bytes"""
+    import fitz  # PyMuPDF, imported on first use to keep startup fast
+    if isinstance(pdf_source, str):
+        return fitz.open(pdf_source)
+    return fitz.open(stream=pdf_source, filetype='pdf')
+
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+def get_page_pool():
+    """Return the process pool used for PDF page OCR, shared across requests"""
+    global _page_pool
+    if _page_pool is None:
+        with _page_pool_lock:
+            if _page_pool is None:
+                logger.info(f"Starting PDF page OCR pool with {OCR_PAGE_WORKERS} workers")
+                context = multiprocessing.get_context(OCR_POOL_START_METHOD)
+                if OCR_POOL_START_METHOD == 'forkserver':
+                    # Workers fork from a server that has the OCR modules loaded already
+                    context.set_forkserver_preload(['app.ocr_service'])
+                _page_pool = ProcessPoolExecutor(max_workers=OCR_PAGE_WORKERS, mp_context=context)
+    return _page_pool
+
+def _reset_page_pool():
+    """Discard a broken page pool so the next call starts a fresh one"""
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is not None:
+            _page_pool.shutdown(wait=False)
+            _page_pool = None
+
+def _ocr_pdf_page_batch(pdf_source, page_numbers, tesseract_cmd, dpi):
+    """
+    Render and OCR a batch of PDF pages (runs in a pool worker)
+    
+    Returns:
+        list: (OCR text, render seconds, OCR seconds) of each page, in the
+            order of page_numbers
+    """
+    import fitz  # PyMuPDF
+    # Spawned workers don't inherit the path configured by setup_tesseract
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    doc = _open_pdf(pdf_source)
     try:
-        # Read image data
-        img_data = file_obj.read()
-        
-        # Open image with PIL
-        image = Image.open(io.BytesIO(img_data))
-        
-        # Print image info for debugging
-        logger.info(f"Image format: {image.format}, size: {image.size}, mode: {image.mode}")
+        results = []
+        for page_num in page_numbers:
+            start = time.perf_counter()
+            page = doc.load_page(page_num)
+            # Render straight into grayscale; no RGB pixmap or conversion
+            pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+            img = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+            rendered = time.perf_counter()
+            
+            # Use a better configuration for document OCR
+            page_text = get_ocr_backend().image_to_string(img, TESSERACT_PSM)
+            results.append((page_text, rendered - start, time.perf_counter() - rendered))
+            logger.info(f"OCR extracted {len(page_text)} characters from PDF page {page_num+1}")
+        return results
+    except Exception as e:
+        # Library exceptions don't always survive pickling back to the parent,
+        # and one that doesn't breaks the whole pool
+        raise RuntimeError(str(e)) from None
+    finally:
+        doc.close()
+
+def ocr_pdf_pages(pdf_source, page_numbers, dpi=None):
+    """
+    OCR the given pages of a PDF, in parallel across the page pool
+    
+    Pages are split into one batch per worker so the PDF (its path, or its
+    bytes for in-memory uploads) is sent to each worker once, and batches are
+    reassembled in page order.
+    
+    Returns:
+        list: OCR text of each page, in the order of page_numbers
+    """
+    tesseract_cmd = pytesseract.pytesseract.tesseract_cmd
+    dpi = dpi or OCR_PDF_DPI
+    page_numbers = list(page_numbers)
+    batch_count = min(OCR_PAGE_WORKERS, len(page_numbers))
+    if batch_count <= 1:
+        return _record_page_timings(_ocr_pdf_page_batch(pdf_source, page_numbers, tesseract_cmd, dpi))
+    
+    batch_size = -(-len(page_numbers) // batch_count)  # ceiling division
+    batches = [page_numbers[start:start + batch_size]
+               for start in range(0, len(page_numbers), batch_size)]
+    try:
+        results = get_page_pool().map(
+            _ocr_pdf_page_batch,
+            [pdf_source] * len(batches),
+            batches,
+            [tesseract_cmd] * len(batches),
+            [dpi] * len(batches)
+        )
+        return _record_page_timings([page for batch in results for page in batch])
+    except BrokenProcessPool:
+        logger.warning("PDF page OCR pool broke, retrying pages serially")
+        _reset_page_pool()
+        return _record_page_timings(_ocr_pdf_page_batch(pdf_source, page_numbers, tesseract_cmd, dpi))
+
+def _record_page_timings(pages):
+    """Record the render and OCR times measured in the workers; return the page texts"""
+    for _, render_seconds, ocr_seconds in pages:
+        metrics.observe_stage("pdf_render", render_seconds)
+        metrics.observe_stage("ocr_page", ocr_seconds)
+    return [text for text, _, _ in pages]
+
+def _ocr_rendered_page(samples, width, height, tesseract_cmd):
+    """
+    OCR a page rendered by the parent process (runs in a pool worker)
+    
+    Returns:
+        tuple: (OCR text, OCR seconds)
+    """
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    try:
+        start = time.perf_counter()
+        img = Image.frombytes("L", (width, height), samples)
+        text = get_ocr_backend().image_to_string(img, TESSERACT_PSM)
+        return text, time.perf_counter() - start
+    except Exception as e:
+        # See _ocr_pdf_page_batch: only plain exceptions may cross the pool
+        raise RuntimeError(str(e)) from None
+
+def _ocr_pdf_pages_with_progress(doc, page_numbers, dpi, progress):
+    """
+    OCR pages while reporting each one as it is rasterized and recognized
+    
+    Pages are rendered in this process, one at a time, and each is handed to
+    the page pool as soon as it is ready, so OCR of early pages overlaps with
+    rendering of later ones and results are reported in completion order.
+    At most two pages per pool worker are rendered and waiting at a time, so
+    long documents don't hold every page's pixels at once. If the pool breaks,
+    the remaining pages are OCR'd here, one by one.
+    
+    Returns:
+        list: OCR text of each page, in the order of page_numbers
+    """
+    import fitz  # PyMuPDF
+    tesseract_cmd = pytesseract.pytesseract.tesseract_cmd
+    dpi = dpi or OCR_PDF_DPI
+    window = 2 * OCR_PAGE_WORKERS
+    texts = {}
+    rasterized = set()
+    pending = {}
+    
+    def render(page_num):
+        with metrics.stage("pdf_render"):
+            pix = doc.load_page(page_num).get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+        if page_num not in rasterized:
+            rasterized.add(page_num)
+            progress("page_rasterized", {"page": page_num + 1, "width": pix.width, "height": pix.height, "dpi": dpi})
+        return pix
+    
+    def recognized(page_num, text, ocr_seconds):
+        texts[page_num] = text
+        metrics.observe_stage("ocr_page", ocr_seconds)
+        progress("page_ocr", {"page": page_num + 1, "method": "ocr", "text": text})
+    
+    def collect_next():
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            page_num = pending.pop(future)
+            recognized(page_num, *future.result())
+    
+    try:
+        pool = get_page_pool()
+        for page_num in page_numbers:
+            if len(pending) >= window:
+                collect_next()
+            pix = render(page_num)
+            # Workers receive their own copy of the pixels
+            pending[pool.submit(_ocr_rendered_page, pix.samples, pix.width, pix.height, tesseract_cmd)] = page_num
+            del pix
+        while pending:
+            collect_next()
+    except BrokenProcessPool:
+        logger.warning("PDF page OCR pool broke, OCRing the remaining pages serially")
+        _reset_page_pool()
+        # Keep the pages workers finished before the pool broke
+        for future, page_num in pending.items():
+            if future.done() and future.exception() is None:
+                recognized(page_num, *future.result())
+        for page_num in page_numbers:
+            if page_num not in texts:
+                pix = render(page_num)
+                recognized(page_num, *_ocr_rendered_page(pix.samples, pix.width, pix.height, tesseract_cmd))
+                del pix
+    return [texts[page_num] for page_num in page_numbers]
+
+def _words_to_text(words):
+    """Rebuild text from OCR words, one output line per Tesseract line"""
+    lines = []
+    current_line = None
+    current_block = None
+    for word in words:
+        if word["line"] != current_line:
+            if current_block is not None and word["line"][0] != current_block:
+                lines.append("")
+            lines.append(word["text"])
+            current_line = word["line"]
+            current_block = word["line"][0]
+        else:
+            lines[-1] += " " + word["text"]
+    return "\n".join(lines) + ("\n" if lines else "")
+
+def _mean_confidence(words):
+    """Character-weighted mean word confidence (0-100), or 0 for no words"""
+    total_chars = sum(len(word["text"]) for word in words)
+    if not total_chars:
+        return 0.0
+    return sum(word["conf"] * len(word["text"]) for word in words) / total_chars
+
+def _score_pass(words):
+    """Score an OCR pass; passes with (almost) no text always lose"""
+    if len("".join(word["text"] for word in words)) < 5:
+        return 0.0
+    return _mean_confidence(words)
+
+def _reocr_low_confidence_lines(backend, image, words):
+    """
+    Re-OCR the low-confidence lines of a pass
+    
+    The lines are cropped and stacked into one strip that is OCR'd in a single
+    call, so a page with many weak lines costs one extra Tesseract run rather
+    than one per line. Each line keeps whichever reading is more confident.
+    
+    Returns:
+        tuple: (words with improved lines substituted, number of lines re-OCR'd)
+    """
+    lines = {}
+    for word in words:
+        lines.setdefault(word["line"], []).append(word)
+    
+    weak = [line_key for line_key, line_words in lines.items()
+            if _mean_confidence(line_words) < OCR_MIN_CONFIDENCE]
+    if not weak:
+        return words, 0
+    
+    crops = []
+    for line_key in weak:
+        line_words = lines[line_key]
+        left = min(word["box"][0] for word in line_words)
+        top = min(word["box"][1] for word in line_words)
+        right = max(word["box"][2] for word in line_words)
+        bottom = max(word["box"][3] for word in line_words)
+        pad = max(4, (bottom - top) // 4)
+        crops.append(image.crop((max(0, left - pad), max(0, top - pad),
+                                 min(image.width, right + pad), min(image.height, bottom + pad))))
+    
+    strip = Image.new(image.mode, (max(crop.width for crop in crops),
+                                   sum(crop.height for crop in crops) + REOCR_LINE_GAP * (len(crops) + 1)), 'white')
+    offsets = []
+    y = REOCR_LINE_GAP
+    for crop in crops:
+        strip.paste(crop, (0, y))
+        offsets.append((y, y + crop.height))
+        y += crop.height + REOCR_LINE_GAP
+    
+    # Assign the strip's words back to the line whose crop holds their center
+    candidates = {line_key: [] for line_key in weak}
+    for word in backend.image_to_data(strip, TESSERACT_PSM):
+        center = (word["box"][1] + word["box"][3]) / 2
+        for line_key, (crop_top, crop_bottom) in zip(weak, offsets):
+            if crop_top <= center < crop_bottom:
+                candidates[line_key].append(word)
+                break
+    
+    result = []
+    for line_key, line_words in lines.items():
+        candidate = candidates.get(line_key)
+        if candidate and _mean_confidence(candidate) > _mean_confidence(line_words):
+            # Keep the original line position so text order is unchanged
+            result.extend(dict(word, line=line_key) for word in candidate)
+        else:
+            result.extend(line_words)
+    return result, len(weak)
+
+_race_pool = None
+_race_pool_lock = threading.Lock()
+
+def _get_race_pool():
+    global _race_pool
+    if _race_pool is None:
+        with _race_pool_lock:
+            if _race_pool is None:
+                _race_pool = ThreadPoolExecutor(max_workers=2 * OCR_ENGINE_POOL_SIZE,
+                                                thread_name_prefix='ocr-race')
+    return _race_pool
+
+def ocr_image(image):
+    """
+    OCR a preprocessed image according to OCR_RETRY_MODE
+    
+    Returns:
+        tuple: (text, dict describing the OCR decision and its confidence)
+    """
+    backend = get_ocr_backend()
+    
+    if OCR_RETRY_MODE == 'race':
+        # Run the dense and sparse layouts side by side and keep the better one
+        futures = {psm: _get_race_pool().submit(backend.image_to_data, image, psm)
+                   for psm in (TESSERACT_PSM, TESSERACT_SPARSE_PSM)}
+        passes = {psm: future.result() for psm, future in futures.items()}
+        scores = {psm: _score_pass(words) for psm, words in passes.items()}
+        best_psm = max(scores, key=lambda psm: (scores[psm], psm == TESSERACT_PSM))
+        logger.info(f"OCR race scores: {scores}, using PSM {best_psm}")
+        return _words_to_text(passes[best_psm]), {
+            "mode": "race",
+            "psm": best_psm,
+            "confidence": round(_mean_confidence(passes[best_psm]), 1),
+            "scores": {str(psm): round(score, 1) for psm, score in scores.items()}
+        }
+    
+    if OCR_RETRY_MODE == 'confidence':
+        words = backend.image_to_data(image, TESSERACT_PSM)
+        initial_confidence = _mean_confidence(words)
+        info = {
+            "mode": "confidence",
+            "psm": TESSERACT_PSM,
+            "initial_confidence": round(initial_confidence, 1),
+            "lines_reocr": 0
+        }
         
-        # Improve image quality for OCR
-        # Convert to grayscale if color
-        if image.mode != 'L':
-            image = image.convert('L')
+        if _score_pass(words) == 0.0:
+            # Nothing usable from the dense layout; try it as sparse text
+            logger.info("OCR yielded little or no text, retrying with sparse PSM")
+            sparse_words = backend.image_to_data(image, TESSERACT_SPARSE_PSM)
+            if _score_pass(sparse_words) > 0.0:
+                words = sparse_words
+                info["psm"] = TESSERACT_SPARSE_PSM
+        elif initial_confidence < OCR_MIN_CONFIDENCE:
+            words, info["lines_reocr"] = _reocr_low_confidence_lines(backend, image, words)
+            logger.info(f"Re-OCR'd {info['lines_reocr']} low-confidence lines")
         
-        # Apply some image enhancement for better OCR results
-        from PIL import ImageEnhance, ImageFilter
+        info["confidence"] = round(_mean_confidence(words), 1)
+        return _words_to_text(words), info
+    
+    # Sequential: PSM 6, then a second full pass with PSM 11 for sparse text
+    text = backend.image_to_string(image, TESSERACT_PSM)
+    psm = TESSERACT_PSM
+    if not text or len(text.strip()) < 5:
+        logger.warning("OCR yielded little or no text")
         
-        # Increase contrast
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(1.5)
+        # Try with different PSM mode for sparse text
+        logger.info("Retrying with different PSM mode")
+        text = backend.image_to_string(image, TESSERACT_SPARSE_PSM)  # Sparse text
+        psm = TESSERACT_SPARSE_PSM
+    return text, {"mode": "sequential", "psm": psm, "confidence": None}
+
+def extract_from_image(file_obj):
+    """Extract text from an image file using the configured OCR backend"""
+    return extract_image_document(file_obj)["text"]
+
+def extract_image_document(file_obj, progress=None):
+    """
+    Extract text from an image file using the configured OCR backend
+    
+    Returns:
+        dict: "text", "ocr" (the OCR decision and its confidence),
+            "preprocess" (per-stage timings and decisions) and "decode"
+            (original vs. decoded size)
+    """
+    try:
+        # Decode straight from the upload buffer, in grayscale and at the
+        # resolution OCR needs (JPEGs via DCT scaling), rejecting huge images
+        with metrics.stage("decode"):
+            image, decode_info = preprocessing.decode_image(file_obj)
         
-        # Apply slight sharpening
-        image = image.filter(ImageFilter.SHARPEN)
+        # Print image info for debugging
+        logger.info(f"Image format: {decode_info['format']}, size: {decode_info['original_size']}, "
+                    f"mode: {decode_info['original_mode']}, decoded at {decode_info['decoded_size']}")
         
-        # Extract text using pytesseract with detailed config
-        custom_config = r'--oem 3 --psm 6'
-        text = pytesseract.image_to_string(image, config=custom_config)
+        # Improve image quality for OCR: grayscale, resolution normalization,
+        # binarization, deskew and border cropping (see app/preprocessing.py)
+        with metrics.stage("preprocess"):
+            image, preprocess_info = preprocessing.preprocess(image)
         
-        if not text or len(text.strip()) < 5:
-            logger.warning("OCR yielded little or no text")
-            
-            # Try with different PSM mode for sparse text
-            logger.info("Retrying with different PSM mode")
-            custom_config = r'--oem 3 --psm 11'  # Sparse text with OSD
-            text = pytesseract.image_to_string(image, config=custom_config)
-        else:
-            logger.info(f"OCR successful, extracted {len(text)} characters")
+        with metrics.stage("ocr_page"):
+            text, ocr_info = ocr_image(image)
+        logger.info(f"OCR extracted {len(text)} characters (confidence: {ocr_info['confidence']})")
+        if progress:
+            progress("page_ocr", {"page": 1, "method": "ocr", "text": text})
             
-        return text
+        return {"text": text, "ocr": ocr_info, "preprocess": preprocess_info, "decode": decode_info}
     except Exception as e:
         logger.error(f"Image OCR error: {str(e)}")
-        raise Exception(f"Failed to extract text from image: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"Failed to extract text from image: {str(e)}")
+
+def _extract_image_in_worker(image_source, tesseract_cmd):
+    """
+    Extract text from an image file path or image bytes (runs in a pool worker)
+    
+    Returns:
+        tuple: (extract_image_document result, stage timings measured in the worker)
+    """
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    token = metrics.begin_request()
+    try:
+        if isinstance(image_source, str):
+            with open(image_source, 'rb') as f:
+                document = extract_image_document(f)
+        else:
+            document = extract_image_document(io.BytesIO(image_source))
+    except Exception as e:
+        # See _ocr_pdf_page_batch: only plain exceptions may cross the pool
+        raise RuntimeError(str(e)) from None
+    finally:
+        timings = metrics.end_request(token)
+    return document, timings
+
+def extract_image_document_in_pool(file_obj, progress=None):
+    """
+    Same as extract_image_document, but the work runs on the page pool and
+    the calling thread only waits for it
+    """
+    # Spooled uploads on disk are opened by path in the worker, not copied to it
+    image_source = file_obj.source() if isinstance(file_obj, SpooledUpload) else file_obj.read()
+    try:
+        future = get_page_pool().submit(_extract_image_in_worker, image_source, pytesseract.pytesseract.tesseract_cmd)
+        document, timings = future.result()
+    except BrokenProcessPool:
+        logger.warning("OCR pool broke, extracting the image in this process")
+        _reset_page_pool()
+        file_obj = file_obj if isinstance(file_obj, SpooledUpload) else io.BytesIO(image_source)
+        file_obj.seek(0)
+        return extract_image_document(file_obj, progress=progress)
+    for stage, (seconds, _) in timings.items():
+        metrics.observe_stage(stage, seconds)
+    if progress:
+        progress("page_ocr", {"page": 1, "method": "ocr", "text": document["text"]})
+    return document
@@ -0,0 +1,282 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+
+from app import metrics
+from app.notification_service import NOTIFY_WORKERS, get_notify_executor, send_sms, place_call
+from app.twilio_pool import lookup_twilio_client
+
+logger = logging.getLogger('outbox')
+
+# Outbox configuration
+OUTBOX_DB = os.getenv('OUTBOX_DB', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static/outbox.db'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '6'))
+OUTBOX_BASE_DELAY = float(os.getenv('OUTBOX_BASE_DELAY', '1'))
+OUTBOX_MAX_DELAY = float(os.getenv('OUTBOX_MAX_DELAY', '60'))
+OUTBOX_POLL_SECONDS = float(os.getenv('OUTBOX_POLL_SECONDS', '1'))
+# A notification left 'sending' this long (e.g. the process died) is retried
+OUTBOX_LEASE_SECONDS = float(os.getenv('OUTBOX_LEASE_SECONDS', '60'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notifications (
+    id TEXT PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    request_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    account_sid TEXT NOT NULL,
+    from_number TEXT,
+    to_number TEXT,
+    contact TEXT,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    sid TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notifications_due ON notifications (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS notifications_request ON notifications (request_id);
+"""
+
+# Calls go out before SMS when both are due
+PRIORITIES = {"call": 0, "sms": 1}
+
+
+def _is_retryable(error):
+    """Network errors, rate limits and Twilio 5xx are retried; other 4xx are not"""
+    status = getattr(error, 'status', None)
+    return status is None or status == 429 or status >= 500
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with jitter for the given number of failed attempts"""
+    delay = min(OUTBOX_MAX_DELAY, OUTBOX_BASE_DELAY * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class Outbox:
+    """
+    Durable queue of outgoing notifications backed by SQLite
+
+    Notifications are committed to disk before anything is sent. A background
+    sender claims due notifications, dispatches them on the notification
+    thread pool and retries failures with exponential backoff. Claims happen
+    inside an immediate transaction so several server processes can share
+    one database without sending a notification twice.
+
+    Args:
+        path: SQLite database file
+    """
+
+    def __init__(self, path=OUTBOX_DB):
+        self.path = path
+        self._wake = threading.Event()
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._thread = None
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def enqueue(self, request_id, notifications):
+        """
+        Durably record notifications for a request
+
+        Each notification's idempotency key is derived from the request id and
+        its position, so repeating a request with the same id returns the
+        notifications already recorded instead of sending them again.
+
+        Args:
+            request_id: Client-supplied idempotency key (or a generated id)
+            notifications: dicts with kind ('sms' or 'call'), account_sid,
+                from_number, to_number, contact and body (SMS text or TwiML)
+
+        Returns:
+            tuple: (list of notification dicts, bool) - the notifications and
+                whether they were already recorded by an earlier request
+        """
+        now = time.time()
+        start = time.perf_counter()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            duplicate = conn.execute(
+                "SELECT 1 FROM notifications WHERE request_id = ? LIMIT 1", (request_id,)).fetchone() is not None
+            if not duplicate:
+                conn.executemany(
+                    "INSERT INTO notifications (id, idempotency_key, request_id, kind, priority, account_sid, "
+                    "from_number, to_number, contact, body, status, next_attempt_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                    [(uuid.uuid4().hex, f"{request_id}:{index}", request_id, item["kind"],
+                      PRIORITIES[item["kind"]], item["account_sid"], item.get("from_number"),
+                      item.get("to_number"), item.get("contact"), item["body"], now, now, now)
+                     for index, item in enumerate(notifications)])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        metrics.observe_stage("outbox_enqueue", time.perf_counter() - start)
+
+        if not duplicate:
+            logger.info(f"Enqueued {len(notifications)} notifications for request {request_id}")
+            self._wake.set()
+        return self.get_request(request_id), duplicate
+
+    def get_request(self, request_id):
+        """Return the notifications of a request, in the order they were enqueued"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT * FROM notifications WHERE request_id = ?", (request_id,)).fetchall()
+        finally:
+            conn.close()
+        rows = sorted(rows, key=lambda row: int(row["idempotency_key"].rsplit(':', 1)[1]))
+        return [self._to_dict(row) for row in rows]
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) FROM notifications GROUP BY status").fetchall()
+        finally:
+            conn.close()
+        return {status: count for status, count in rows}
+
+    @staticmethod
+    def _to_dict(row):
+        return {
+            "notification_id": row["id"],
+            "kind": row["kind"],
+            "contact": row["contact"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "sid": row["sid"],
+            "error": row["error"],
+            "next_attempt_at": row["next_attempt_at"] if row["status"] == 'queued' else None,
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+    def start(self):
+        """Start the background sender thread (once)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='outbox-sender', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                self._release_expired_leases()
+                for row in self._claim_due():
+                    get_notify_executor().submit(self._deliver, row)
+            except Exception as e:
+                logger.error(f"Outbox sender error: {str(e)}")
+            self._wake.wait(OUTBOX_POLL_SECONDS)
+
+    def _release_expired_leases(self):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE notifications SET status = 'queued' WHERE status = 'sending' AND updated_at < ?",
+                (time.time() - OUTBOX_LEASE_SECONDS,))
+        finally:
+            conn.close()
+
+    def _claim_due(self):
+        """Mark due notifications as 'sending' and return them"""
+        with self._in_flight_lock:
+            capacity = NOTIFY_WORKERS - self._in_flight
+        if capacity <= 0:
+            return []
+
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT * FROM notifications WHERE status = 'queued' AND next_attempt_at <= ? "
+                "ORDER BY priority, created_at LIMIT ?", (now, capacity)).fetchall()
+            conn.executemany(
+                "UPDATE notifications SET status = 'sending', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                [(now, row["id"]) for row in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        with self._in_flight_lock:
+            self._in_flight += len(rows)
+        return rows
+
+    def _deliver(self, row):
+        attempts = row["attempts"] + 1
+        contact = {"name": row["contact"], "phoneNumber": row["to_number"]}
+        try:
+            client = lookup_twilio_client(row["account_sid"])
+            if client is None:
+                raise ValueError(f"No Twilio credentials for account {row['account_sid']}")
+            with metrics.stage(f"twilio_{row['kind']}"):
+                if row["kind"] == 'call':
+                    result = place_call(client, row["from_number"], contact, row["body"])
+                else:
+                    result = send_sms(client, row["from_number"], contact, row["body"])
+            self._finish(row["id"], "sent", sid=result["sid"])
+        except Exception as e:
+            if _is_retryable(e) and not isinstance(e, ValueError) and attempts < OUTBOX_MAX_ATTEMPTS:
+                delay = backoff_delay(attempts)
+                logger.warning(f"{row['kind']} {row['id']} failed (attempt {attempts}), retrying in {delay:.1f}s: {str(e)}")
+                self._finish(row["id"], "queued", error=str(e), next_attempt_at=time.time() + delay)
+            else:
+                logger.error(f"{row['kind']} {row['id']} failed permanently: {str(e)}")
+                self._finish(row["id"], "failed", error=str(e))
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+            self._wake.set()
+
+    def _finish(self, notification_id, status, sid=None, error=None, next_attempt_at=None):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE notifications SET status = ?, sid = ?, error = ?, next_attempt_at = ?, updated_at = ? "
+                "WHERE id = ?", (status, sid, error, next_attempt_at or now, now, notification_id))
+        finally:
+            conn.close()
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox():
+    """Return the process-wide outbox with its sender running, creating it on first use"""
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                _outbox = Outbox()
+                _outbox.start()
+    return _outbox
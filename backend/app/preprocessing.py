@@ -0,0 +1,384 @@
+import os
+import math
+import time
+import logging
+
+import numpy as np
+from PIL import Image, ImageEnhance, ImageFilter
+
+from app import metrics
+
+logger = logging.getLogger('preprocessing')
+
+# Stages run by default, in order. Available stages: normalize, binarize,
+# deskew, crop, and the legacy contrast and sharpen filters.
+DEFAULT_STAGES = os.getenv('OCR_PREPROCESS_STAGES', 'normalize,binarize,deskew,crop')
+
+# Tesseract is most accurate with text lines roughly 20-30 pixels tall
+OCR_TARGET_TEXT_HEIGHT = int(os.getenv('OCR_TARGET_TEXT_HEIGHT', '24'))
+OCR_MAX_DIMENSION = int(os.getenv('OCR_MAX_DIMENSION', '3500'))
+
+# Scale factors beyond these are almost always a bad text height estimate
+MIN_SCALE = 0.2
+MAX_SCALE = 2.0
+
+# Deskew searches this range of angles (degrees)
+MAX_SKEW_ANGLE = 10.0
+
+# Images with more pixels than this are rejected from their header, before
+# any pixels are allocated (decompression bombs)
+OCR_MAX_IMAGE_PIXELS = int(os.getenv('OCR_MAX_IMAGE_PIXELS', str(80 * 1000 * 1000)))
+# Formats without reduced-resolution decoding (everything but JPEG) are
+# decoded in full before they can be downsampled, so they get a lower limit
+OCR_MAX_FULL_DECODE_PIXELS = int(os.getenv('OCR_MAX_FULL_DECODE_PIXELS', str(40 * 1000 * 1000)))
+# Images are decoded (JPEG) or downsampled (other formats) to at most this many pixels
+OCR_DECODE_MAX_PIXELS = int(os.getenv('OCR_DECODE_MAX_PIXELS', str(16 * 1000 * 1000)))
+# JPEGs larger than this get a reduced-resolution probe decode to find the
+# resolution OCR needs before the real decode
+DRAFT_PROBE_MIN_PIXELS = 4 * 1000 * 1000
+# Rows binarized at a time (bounds the memory of the integral images)
+BINARIZE_TILE_ROWS = 256
+
+
+class ImageTooLargeError(ValueError):
+    """The image's dimensions exceed OCR_MAX_IMAGE_PIXELS (OCR_MAX_FULL_DECODE_PIXELS for non-JPEGs)"""
+
+
+def otsu_threshold(pixels):
+    """Return the global Otsu threshold of a uint8 array"""
+    hist = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if total == 0:
+        return 128
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    cum_mean = np.cumsum(hist * levels)
+    mean_bg = cum_mean / np.maximum(weight_bg, 1)
+    mean_fg = (cum_mean[-1] - cum_mean) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+
+def _ink_runs(mask_rows):
+    """Return the lengths of consecutive runs of True in a 1-D boolean array"""
+    padded = np.concatenate(([False], mask_rows, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return edges[1::2] - edges[::2]
+
+
+def _ink_points(ink, max_side=1000):
+    """Coordinates of ink pixels on a grid of at most max_side, and the grid step"""
+    step = max(1, max(ink.shape) // max_side)
+    ys, xs = np.nonzero(ink[::step, ::step])
+    return ys, xs, step
+
+
+def _row_profile(ys, xs, angle):
+    """Ink count per row after shearing the points by angle (degrees)"""
+    rows = np.round(ys - xs * np.tan(np.radians(angle))).astype(np.int64)
+    return np.bincount(rows - rows.min())
+
+
+def find_skew_angle(ys, xs):
+    """
+    Find the rotation that makes text lines horizontal
+
+    Text lines produce the sharpest row profile (largest sum of squares) when
+    the points are sheared by the page's skew angle.
+    """
+    def best_angle(angles):
+        scores = [np.sum(_row_profile(ys, xs, angle).astype(np.float64) ** 2) for angle in angles]
+        return float(angles[int(np.argmax(scores))])
+
+    coarse = best_angle(np.arange(-MAX_SKEW_ANGLE, MAX_SKEW_ANGLE + 0.5, 1.0))
+    return best_angle(np.arange(coarse - 1.0, coarse + 1.0, 0.1))
+
+
+def estimate_text_height(pixels):
+    """
+    Estimate the typical text line height in pixels from the row ink profile
+
+    The profile is taken along the page's skew angle so slightly rotated
+    photos don't smear neighbouring lines together.
+
+    Returns:
+        float or None: Median line height, or None when no line structure is found
+    """
+    ink = pixels < otsu_threshold(pixels)
+    ys, xs, step = _ink_points(ink)
+    if len(ys) < 100:
+        return None
+    profile = _row_profile(ys, xs, find_skew_angle(ys, xs))
+    row_ink = profile / max(1, ink.shape[1] // step)
+    # Rows belonging to a text line carry some ink but are not solid rules
+    text_rows = (row_ink > 0.01) & (row_ink < 0.6)
+    runs = _ink_runs(text_rows) * step
+    runs = runs[runs >= 4]
+    if len(runs) < 3:
+        return None
+    return float(np.median(runs))
+
+
+def _resize(pixels, scale):
+    height, width = pixels.shape
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    resample = Image.LANCZOS if scale > 1 else Image.BOX
+    return np.asarray(Image.fromarray(pixels).resize(size, resample))
+
+
+def normalize(pixels, info):
+    """Resize so text lines are about OCR_TARGET_TEXT_HEIGHT pixels tall"""
+    height, width = pixels.shape
+    # Estimate on a reduced copy; the line profile survives downsampling
+    probe_scale = min(1.0, 1500 / max(height, width))
+    probe = _resize(pixels, probe_scale) if probe_scale < 1.0 else pixels
+    text_height = estimate_text_height(probe)
+
+    if text_height is not None:
+        text_height /= probe_scale
+        scale = min(MAX_SCALE, max(MIN_SCALE, OCR_TARGET_TEXT_HEIGHT / text_height))
+    else:
+        scale = 1.0
+    # Never hand Tesseract more than OCR_MAX_DIMENSION pixels on a side
+    scale = min(scale, OCR_MAX_DIMENSION / max(height, width))
+
+    info["text_height"] = round(text_height, 1) if text_height is not None else None
+    info["scale"] = round(scale, 3)
+    if abs(scale - 1.0) < 0.05:
+        return pixels
+    return _resize(pixels, scale)
+
+
+def _probe_text_height(file_obj, size):
+    """Estimate the full-resolution text height from a 1/4 scale grayscale JPEG decode"""
+    file_obj.seek(0)
+    with Image.open(file_obj) as probe:
+        probe.draft('L', (size[0] // 4, size[1] // 4))
+        pixels = np.asarray(probe.convert('L'))
+    text_height = estimate_text_height(pixels)
+    return text_height * size[0] / pixels.shape[1] if text_height is not None else None
+
+
+def decode_scale(file_obj, size):
+    """
+    Return the fraction of an image's resolution OCR needs
+
+    The image is never needed larger than normalize would make it: text lines
+    about OCR_TARGET_TEXT_HEIGHT tall, at most OCR_MAX_DIMENSION on a side and
+    OCR_DECODE_MAX_PIXELS in total.
+    """
+    width, height = size
+    scale = min(1.0, OCR_MAX_DIMENSION / max(width, height), math.sqrt(OCR_DECODE_MAX_PIXELS / (width * height)))
+    if width * height >= DRAFT_PROBE_MIN_PIXELS and "normalize" in parse_stages(DEFAULT_STAGES):
+        text_height = _probe_text_height(file_obj, size)
+        if text_height is not None:
+            scale = min(scale, max(MIN_SCALE, OCR_TARGET_TEXT_HEIGHT / text_height))
+    return scale
+
+
+def decode_image(file_obj):
+    """
+    Decode an image for OCR, in grayscale and at no more than the resolution OCR needs
+
+    The size is read from the header first: images over OCR_MAX_IMAGE_PIXELS
+    are rejected before decoding. JPEGs are decoded straight to grayscale
+    with DCT scaling (draft mode) at the smallest 1/2, 1/4 or 1/8 scale that
+    still covers decode_scale, so the full-resolution color image is never
+    allocated. Other formats can only be decoded in full, so they are limited
+    to OCR_MAX_FULL_DECODE_PIXELS and downsampled right after decoding if
+    they exceed OCR_DECODE_MAX_PIXELS.
+
+    Args:
+        file_obj: Seekable file object with the encoded image
+
+    Returns:
+        tuple: (grayscale PIL image, dict with format, original size and mode,
+            decoded size, and whether DCT scaling (draft) or downsampling was used)
+
+    Raises:
+        ImageTooLargeError: The image has too many pixels
+    """
+    try:
+        image = Image.open(file_obj)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e)) from None
+    width, height = image.size
+    info = {
+        "format": image.format,
+        "original_size": [width, height],
+        "original_mode": image.mode,
+        "draft": False,
+        "downsampled": False
+    }
+    limit = OCR_MAX_IMAGE_PIXELS if image.format == 'JPEG' else min(OCR_MAX_IMAGE_PIXELS, OCR_MAX_FULL_DECODE_PIXELS)
+    if width * height > limit:
+        raise ImageTooLargeError(f"Image is {width}x{height} ({width * height / 1e6:.0f} megapixels); "
+                                 f"the limit for {image.format} images is {limit / 1e6:.0f} megapixels")
+
+    if image.format == 'JPEG':
+        scale = decode_scale(file_obj, image.size)
+        file_obj.seek(0)
+        image = Image.open(file_obj)
+        image.draft('L', (max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale))))
+        info["draft"] = image.size != (width, height)
+    image.load()
+    if image.mode != 'L':
+        image = image.convert('L')
+
+    pixels = image.size[0] * image.size[1]
+    if pixels > OCR_DECODE_MAX_PIXELS:
+        factor = math.ceil(math.sqrt(pixels / OCR_DECODE_MAX_PIXELS))
+        image = image.reduce(factor)
+        info["downsampled"] = True
+    info["decoded_size"] = list(image.size)
+    return image, info
+
+
+def binarize(pixels, info, window=None, k=0.2, dynamic_range=128.0):
+    """
+    Sauvola adaptive binarization using integral images
+
+    Works in bands of BINARIZE_TILE_ROWS rows, so the integral images and
+    per-pixel statistics only ever exist for one band at a time.
+    """
+    if window is None:
+        # About two text lines tall, odd, and at least 15 pixels
+        window = max(15, (2 * OCR_TARGET_TEXT_HEIGHT) | 1)
+    half = window // 2
+    height, width = pixels.shape
+
+    # Pad by half a window so every pixel has a full window; box sums are then
+    # plain slice arithmetic on the integral images
+    padded = np.pad(pixels, half + 1, mode='reflect')
+    output = np.empty((height, width), dtype=np.uint8)
+    for top in range(0, height, BINARIZE_TILE_ROWS):
+        rows = min(BINARIZE_TILE_ROWS, height - top)
+        # Integer integrals are exact; a band needs a window of rows below it
+        values = padded[top:top + rows + window].astype(np.int64)
+        integral = values.cumsum(axis=0).cumsum(axis=1)
+        values *= values
+        integral_sq = values.cumsum(axis=0).cumsum(axis=1)
+        del values
+
+        def window_mean(table):
+            total = (table[window:, window:] - table[:-window, window:]
+                     - table[window:, :-window] + table[:-window, :-window])
+            return total[:rows, :width] / (window * window)
+
+        mean = window_mean(integral)
+        del integral
+        deviation = window_mean(integral_sq)
+        del integral_sq
+        deviation -= mean ** 2
+        np.maximum(deviation, 0, out=deviation)
+        np.sqrt(deviation, out=deviation)
+        # threshold = mean * (1 + k * (std / dynamic_range - 1))
+        deviation *= k / dynamic_range
+        deviation += 1 - k
+        mean *= deviation
+        del deviation
+        output[top:top + rows] = np.where(pixels[top:top + rows] > mean, 255, 0)
+
+    info["binarize_window"] = window
+    return output
+
+
+def deskew(pixels, info):
+    """Rotate the page so text lines are horizontal (projection profile search)"""
+    ys, xs, _ = _ink_points(pixels < 128)
+    if len(ys) < 100:
+        info["skew_angle"] = 0.0
+        return pixels
+
+    angle = find_skew_angle(ys, xs)
+    info["skew_angle"] = round(angle, 2)
+    if abs(angle) < 0.2:
+        return pixels
+    rotated = Image.fromarray(pixels).rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    return np.asarray(rotated)
+
+
+def crop(pixels, info, margin=10):
+    """Trim blank margins and solid scanner borders around the text"""
+    ink = pixels < 128
+    # Rows/columns that are almost entirely ink are borders, not text; drop
+    # them before measuring so they don't pull the box out to the edges
+    border_rows = ink.mean(axis=1) >= 0.8
+    border_cols = ink.mean(axis=0) >= 0.8
+    ink = ink & ~border_rows[:, None] & ~border_cols[None, :]
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    if len(rows) == 0 or len(cols) == 0:
+        return pixels
+
+    height, width = pixels.shape
+    top = max(0, rows[0] - margin)
+    bottom = min(height, rows[-1] + margin + 1)
+    left = max(0, cols[0] - margin)
+    right = min(width, cols[-1] + margin + 1)
+    info["crop_box"] = [int(left), int(top), int(right), int(bottom)]
+    return pixels[top:bottom, left:right]
+
+
+def contrast(pixels, info, factor=1.5):
+    """Legacy contrast boost (PIL ImageEnhance)"""
+    return np.asarray(ImageEnhance.Contrast(Image.fromarray(pixels)).enhance(factor))
+
+
+def sharpen(pixels, info):
+    """Legacy sharpening filter (PIL ImageFilter.SHARPEN)"""
+    return np.asarray(Image.fromarray(pixels).filter(ImageFilter.SHARPEN))
+
+
+STAGES = {
+    "normalize": normalize,
+    "binarize": binarize,
+    "deskew": deskew,
+    "crop": crop,
+    "contrast": contrast,
+    "sharpen": sharpen
+}
+
+
+def parse_stages(stages):
+    """Turn a comma-separated stage list into stage names, validating each"""
+    if isinstance(stages, str):
+        stages = [name.strip() for name in stages.split(',') if name.strip()]
+    unknown = [name for name in stages if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown preprocessing stages: {', '.join(unknown)}")
+    return list(stages)
+
+
+def preprocess(image, stages=None):
+    """
+    Prepare an image for OCR
+
+    Args:
+        image: PIL image in any mode
+        stages: Stage names or a comma-separated string (defaults to OCR_PREPROCESS_STAGES)
+
+    Returns:
+        tuple: (grayscale PIL image, dict with per-stage timings and decisions)
+    """
+    stages = parse_stages(DEFAULT_STAGES if stages is None else stages)
+    info = {"input_size": list(image.size), "timings_ms": {}}
+
+    start = time.perf_counter()
+    if image.mode != 'L':
+        image = image.convert('L')
+    pixels = np.asarray(image)
+    info["timings_ms"]["grayscale"] = round((time.perf_counter() - start) * 1000, 2)
+
+    for name in stages:
+        start = time.perf_counter()
+        pixels = STAGES[name](pixels, info)
+        elapsed = time.perf_counter() - start
+        info["timings_ms"][name] = round(elapsed * 1000, 2)
+        metrics.observe_stage(f"preprocess.{name}", elapsed)
+
+    info["output_size"] = [int(pixels.shape[1]), int(pixels.shape[0])]
+    logger.info(f"Preprocessed {info['input_size']} -> {info['output_size']} "
+                f"in {sum(info['timings_ms'].values()):.1f} ms")
+    return Image.fromarray(pixels), info
@@ -0,0 +1,283 @@
+import os
+import re
+import hmac
+import html
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+
+from app import metrics
+
+logger = logging.getLogger('record_store')
+
+# Record store configuration. Storing records is off unless enabled, and
+# records are only stored for requests that identify their clinic with an API
+# key from RECORDS_API_KEYS ("key=clinic" pairs, comma separated)
+RECORD_STORE_ENABLED = os.getenv('RECORD_STORE_ENABLED', 'false').lower() == 'true'
+RECORDS_API_KEYS = os.getenv('RECORDS_API_KEYS', '')
+RECORDS_DB = os.getenv('RECORDS_DB', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static/records.db'))
+RECORDS_PER_PAGE = int(os.getenv('RECORDS_PER_PAGE', '20'))
+RECORDS_MAX_PER_PAGE = int(os.getenv('RECORDS_MAX_PER_PAGE', '100'))
+# Characters of OCR text included with each record in list and search results
+RECORD_PREVIEW_CHARS = 200
+
+# The FTS5 index is an external-content table over records, kept in sync by
+# triggers, so the text is stored once and searched through the index
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id TEXT PRIMARY KEY,
+    clinic TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    file_name TEXT,
+    pages INTEGER,
+    original_text TEXT NOT NULL,
+    summary TEXT,
+    summary_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (clinic, content_hash)
+);
+CREATE INDEX IF NOT EXISTS records_created ON records (clinic, created_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+    file_name, original_text, summary,
+    content='records', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS records_ai AFTER INSERT ON records BEGIN
+    INSERT INTO records_fts (rowid, file_name, original_text, summary)
+    VALUES (new.rowid, new.file_name, new.original_text, new.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS records_ad AFTER DELETE ON records BEGIN
+    INSERT INTO records_fts (records_fts, rowid, file_name, original_text, summary)
+    VALUES ('delete', old.rowid, old.file_name, old.original_text, old.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS records_au AFTER UPDATE ON records BEGIN
+    INSERT INTO records_fts (records_fts, rowid, file_name, original_text, summary)
+    VALUES ('delete', old.rowid, old.file_name, old.original_text, old.summary);
+    INSERT INTO records_fts (rowid, file_name, original_text, summary)
+    VALUES (new.rowid, new.file_name, new.original_text, new.summary);
+END;
+"""
+
+# Word characters of a search term; a trailing * keeps prefix matching
+SEARCH_TERM = re.compile(r'\w+\*?')
+
+# Snippets are highlighted with these control characters, then HTML-escaped,
+# then the markers are turned into <mark> tags; they are removed from stored text
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+SNIPPET_MARKERS = re.compile('[\x02\x03]')
+
+
+def parse_api_keys(value):
+    """Parse "key=clinic,key=clinic" into a dict of API key to clinic"""
+    keys = {}
+    for entry in value.split(','):
+        key, _, clinic = entry.strip().partition('=')
+        if key and clinic.strip():
+            keys[key] = clinic.strip()
+    return keys
+
+
+_api_keys = parse_api_keys(RECORDS_API_KEYS)
+
+
+def clinic_for_key(api_key):
+    """Return the clinic an API key belongs to, or None for an unknown key"""
+    if not api_key:
+        return None
+    for key, clinic in _api_keys.items():
+        if hmac.compare_digest(key.encode('utf-8'), api_key.encode('utf-8')):
+            return clinic
+    return None
+
+
+def highlight_snippet(snippet):
+    """HTML-escape a snippet and wrap its matched terms in <mark> tags"""
+    escaped = html.escape(snippet or '')
+    return escaped.replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
+
+
+def fts_query(query):
+    """
+    Turn free text into an FTS5 query matching documents containing every term
+
+    Terms are quoted so punctuation and FTS operators in user input can't
+    break the query. Returns None if the query has no searchable terms.
+    """
+    terms = []
+    for term in SEARCH_TERM.findall(query or ''):
+        if term.endswith('*'):
+            terms.append(f'"{term[:-1]}"*')
+        else:
+            terms.append(f'"{term}"')
+    return " ".join(terms) or None
+
+
+def _page_bounds(page, per_page):
+    page = max(1, int(page or 1))
+    per_page = min(RECORDS_MAX_PER_PAGE, max(1, int(per_page or RECORDS_PER_PAGE)))
+    return page, per_page
+
+
+class RecordStore:
+    """
+    Persistent store of OCR text and summaries with a full-text index
+
+    Every record belongs to a clinic, and every read, search and delete is
+    limited to one clinic's records. Within a clinic records are keyed by the
+    document's content hash, so processing the same document again updates
+    its record instead of adding a duplicate.
+
+    Args:
+        path: SQLite database file
+    """
+
+    def __init__(self, path=RECORDS_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(records)")}
+            if columns and "clinic" not in columns:
+                raise RuntimeError(f"{path} has records without a clinic; move it aside to start a clinic-scoped store")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def save(self, clinic, content_hash, file_name, original_text, summary=None, summary_error=None, pages=None):
+        """
+        Insert or update a clinic's record of a document
+
+        Returns:
+            str: The record id
+        """
+        now = time.time()
+        start = time.perf_counter()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "INSERT INTO records (id, clinic, content_hash, file_name, pages, original_text, summary, "
+                "summary_error, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (clinic, content_hash) DO UPDATE SET file_name = excluded.file_name, pages = excluded.pages, "
+                "original_text = excluded.original_text, summary = excluded.summary, "
+                "summary_error = excluded.summary_error, updated_at = excluded.updated_at "
+                "RETURNING id",
+                (uuid.uuid4().hex, clinic, content_hash, file_name, pages,
+                 SNIPPET_MARKERS.sub('', original_text), summary, summary_error, now, now)
+            ).fetchone()
+        finally:
+            conn.close()
+        metrics.observe_stage("record_save", time.perf_counter() - start)
+        return row["id"]
+
+    def get(self, clinic, record_id):
+        """Return a clinic's record with its full OCR text and summary, or None"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM records WHERE id = ? AND clinic = ?", (record_id, clinic)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return dict(self._to_dict(row), original_text=row["original_text"], summary=row["summary"])
+
+    def list(self, clinic, page=1, per_page=None):
+        """
+        Return a page of a clinic's records, newest first
+
+        Returns:
+            dict: "records", "page", "per_page" and "total"
+        """
+        page, per_page = _page_bounds(page, per_page)
+        conn = self._connect()
+        try:
+            total = conn.execute("SELECT COUNT(*) FROM records WHERE clinic = ?", (clinic,)).fetchone()[0]
+            rows = conn.execute(
+                "SELECT * FROM records WHERE clinic = ? ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (clinic, per_page, (page - 1) * per_page)).fetchall()
+        finally:
+            conn.close()
+        return {"records": [self._to_dict(row) for row in rows], "page": page, "per_page": per_page, "total": total}
+
+    def search(self, clinic, query, page=1, per_page=None):
+        """
+        Return a page of a clinic's records matching a search query, best matches first
+
+        Each record carries a "snippet" of the matching text, HTML-escaped,
+        with the matched terms wrapped in <mark> tags.
+
+        Returns:
+            dict: "records", "page", "per_page" and "total"
+        """
+        page, per_page = _page_bounds(page, per_page)
+        match = fts_query(query)
+        if match is None:
+            return {"records": [], "page": page, "per_page": per_page, "total": 0}
+
+        start = time.perf_counter()
+        conn = self._connect()
+        try:
+            total = conn.execute(
+                "SELECT COUNT(*) FROM records_fts JOIN records ON records.rowid = records_fts.rowid "
+                "WHERE records_fts MATCH ? AND records.clinic = ?", (match, clinic)).fetchone()[0]
+            rows = conn.execute(
+                "SELECT records.*, snippet(records_fts, -1, ?, ?, '...', 16) AS snippet "
+                "FROM records_fts JOIN records ON records.rowid = records_fts.rowid "
+                "WHERE records_fts MATCH ? AND records.clinic = ? ORDER BY bm25(records_fts) LIMIT ? OFFSET ?",
+                (SNIPPET_START, SNIPPET_END, match, clinic, per_page, (page - 1) * per_page)).fetchall()
+        finally:
+            conn.close()
+        metrics.observe_stage("record_search", time.perf_counter() - start)
+        return {
+            "records": [dict(self._to_dict(row), snippet=highlight_snippet(row["snippet"])) for row in rows],
+            "page": page,
+            "per_page": per_page,
+            "total": total
+        }
+
+    def delete(self, clinic, record_id):
+        """Delete a clinic's record; returns whether it existed"""
+        conn = self._connect()
+        try:
+            deleted = conn.execute("DELETE FROM records WHERE id = ? AND clinic = ?", (record_id, clinic)).rowcount
+        finally:
+            conn.close()
+        return deleted > 0
+
+    @staticmethod
+    def _to_dict(row):
+        text = row["original_text"]
+        return {
+            "record_id": row["id"],
+            "content_hash": row["content_hash"],
+            "file_name": row["file_name"],
+            "pages": row["pages"],
+            "preview": text[:RECORD_PREVIEW_CHARS],
+            "has_summary": row["summary"] is not None,
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_record_store():
+    """Return the process-wide record store, creating it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = RecordStore()
+    return _store
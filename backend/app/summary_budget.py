@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from app import metrics
+from app.extractive_summary import extractive_summary
+from app.summary_cache import cached_summarize, get_cached_summary
+
+logger = logging.getLogger('summary_budget')
+
+# Seconds a request waits for the AI summary before answering with a local
+# extractive summary (0 waits as long as the model takes)
+SUMMARY_LATENCY_BUDGET = float(os.getenv('SUMMARY_LATENCY_BUDGET', '20'))
+MAX_SUMMARY_LATENCY_BUDGET = 300
+# Model calls that outlive their request keep running on these threads
+SUMMARY_BACKGROUND_WORKERS = int(os.getenv('SUMMARY_BACKGROUND_WORKERS', '8'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_summary_executor():
+    """Return the shared thread pool that runs budgeted model calls"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=SUMMARY_BACKGROUND_WORKERS, thread_name_prefix='summary')
+    return _executor
+
+
+def fallback_summary(text, reason, model_error):
+    """Local extractive summary marked as a fallback, with why the model's wasn't used"""
+    with metrics.stage("summary_fallback"):
+        result = extractive_summary(text)
+    return dict(result, fallback=True, fallback_reason=reason, model_error=model_error)
+
+
+def budgeted_summarize(text, summarize=None, budget=None):
+    """
+    Summarize text, falling back to a local extractive summary if the model is
+    too slow or fails
+
+    A model call that misses the budget is not cancelled: it finishes in the
+    background and its summary is cached, so the next request for the same
+    text gets it.
+
+    Args:
+        summarize: Function returning a summarize_medical_text style result
+            (defaults to cached_summarize)
+        budget: Seconds to wait for the model (defaults to SUMMARY_LATENCY_BUDGET;
+            0 waits without a limit)
+
+    Returns:
+        dict: The model's result, or the fallback with "fallback",
+            "fallback_reason" ('timeout' or 'error') and "model_error"
+    """
+    budget = SUMMARY_LATENCY_BUDGET if budget is None else budget
+
+    start = time.perf_counter()
+    try:
+        # The cache key needs the AI service's model name, so the lookup can
+        # fail the same way the model call can
+        if summarize is None:
+            cached = get_cached_summary(text)
+            if cached is not None:
+                return dict(cached, cached=True)
+            summarize = cached_summarize
+        future = get_summary_executor().submit(summarize, text)
+        result = future.result(timeout=budget or None)
+    except TimeoutError:
+        logger.warning(f"No summary within the {budget:g}s budget; using the local summary")
+        return fallback_summary(text, "timeout", f"The AI summary took longer than {budget:g} seconds")
+    except Exception as e:
+        logger.error(f"Summarization error after {time.perf_counter() - start:.1f}s: {str(e)}")
+        return fallback_summary(text, "error", str(e))
+
+    if not result["success"]:
+        # Keep the failed result's details (e.g. per-chunk timings of a chunked summary)
+        return dict(result, **fallback_summary(text, "error", result["error"]))
+    return result
@@ -0,0 +1,126 @@
+import hashlib
+import importlib
+import os
+import threading
+import logging
+from concurrent.futures import Future
+
+from app import metrics
+from app.cache import LRUCache
+
+logger = logging.getLogger('summary_cache')
+
+# Cache configuration. Bump SUMMARY_PROMPT_VERSION whenever the prompt in
+# ai_service changes so summaries produced by the old prompt are not reused.
+SUMMARY_CACHE_MB = int(os.getenv('SUMMARY_CACHE_MB', '32'))
+SUMMARY_CACHE_TTL_SECONDS = int(os.getenv('SUMMARY_CACHE_TTL_SECONDS', str(24 * 60 * 60)))
+SUMMARY_PROMPT_VERSION = os.getenv('SUMMARY_PROMPT_VERSION', '1')
+SUMMARY_MODEL = os.getenv('GEMINI_MODEL')
+
+
+def get_ai_service():
+    """Import the AI service on first use; its client library is slow to load"""
+    return importlib.import_module('app.ai_service')
+
+
+def summary_model():
+    return SUMMARY_MODEL or getattr(get_ai_service(), 'MODEL_NAME', 'gemini')
+
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different OCR output shares a cache entry"""
+    return " ".join(text.split())
+
+
+def summary_key(text):
+    """Cache key for a text: hash of the normalized text, model and prompt version"""
+    digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+    return f"{summary_model()}:{SUMMARY_PROMPT_VERSION}:{digest}"
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for and share its result (or exception).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Returns:
+            tuple: (result, bool) - the result and whether it came from another caller's call
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                leader = False
+            else:
+                future = Future()
+                self._calls[key] = future
+                leader = True
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result(), False
+
+
+_cache = LRUCache(SUMMARY_CACHE_MB * 1024 * 1024, ttl=SUMMARY_CACHE_TTL_SECONDS)
+_flight = SingleFlight()
+
+
+def get_cached_summary(text):
+    """Return a cached successful summary result for text, or None"""
+    return _cache.get(summary_key(text))
+
+
+def store_summary(text, summary_result):
+    """Cache a summary result if it succeeded"""
+    if summary_result.get("success"):
+        _cache.set(summary_key(text), summary_result)
+
+
+def cached_summarize(text):
+    """
+    Summarize medical text through the cache, with single-flight deduplication
+
+    Concurrent requests for the same text wait on one in-flight model call
+    instead of issuing duplicates. Only successful summaries are cached.
+
+    Returns:
+        dict: The summarize_medical_text result, plus "cached"
+    """
+    key = summary_key(text)
+    cached = _cache.get(key)
+    if cached is not None:
+        logger.info(f"Summary cache hit ({key[-12:]})")
+        return dict(cached, cached=True)
+
+    def call():
+        with metrics.stage("ai_call"):
+            result = get_ai_service().summarize_medical_text(text)
+        store_summary(text, result)
+        return result
+
+    result, shared = _flight.do(key, call)
+    if shared:
+        logger.info(f"Shared in-flight summary ({key[-12:]})")
+    return dict(result, cached=shared)
+
+
+def summary_cache_stats():
+    return dict(_cache.stats(), single_flight_shared=_flight.shared)
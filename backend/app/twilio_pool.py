@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+import logging
+
+from app.notification_service import NOTIFY_WORKERS
+
+logger = logging.getLogger('twilio_pool')
+
+# Twilio HTTP configuration
+TWILIO_HTTP_TIMEOUT = float(os.getenv('TWILIO_HTTP_TIMEOUT', '10'))
+TWILIO_WARM_UP = os.getenv('TWILIO_WARM_UP', 'true').lower() == 'true'
+
+
+class PooledClient:
+    """
+    A Twilio client whose HTTP session keeps connections alive
+
+    The session's connection pool holds one connection per concurrent
+    dispatch worker, so fanned-out notifications reuse warm TLS connections
+    instead of opening new ones.
+    """
+
+    def __init__(self, account_sid, auth_token):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.requests = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+        # twilio is slow to import, so it is loaded with the first client
+        from requests.adapters import HTTPAdapter
+        from twilio.rest import Client
+        from twilio.http.http_client import TwilioHttpClient
+
+        self.http_client = TwilioHttpClient(
+            pool_connections=True,
+            request_hooks={"response": [self._record]},
+            timeout=TWILIO_HTTP_TIMEOUT
+        )
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=NOTIFY_WORKERS)
+        self.http_client.session.mount('https://', self._adapter)
+        self.client = Client(account_sid, auth_token, http_client=self.http_client)
+
+    def _record(self, response, *args, **kwargs):
+        elapsed_ms = response.elapsed.total_seconds() * 1000
+        with self._lock:
+            self.requests += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def warm_up(self):
+        """Open a connection (TLS handshake included) with a cheap account fetch"""
+        start = time.perf_counter()
+        self.client.api.accounts(self.account_sid).fetch()
+        logger.info(f"Warmed Twilio client for {self.account_sid[:8]}... in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def stats(self):
+        # urllib3 counts new connections and requests per host pool; the
+        # difference is the number of requests served by a kept-alive connection
+        connections = 0
+        pooled_requests = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections += pool.num_connections
+            pooled_requests += pool.num_requests
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections_opened": connections,
+                "connections_reused": max(0, pooled_requests - connections),
+                "avg_ms": round(self.total_ms / self.requests, 1) if self.requests else None,
+                "max_ms": round(self.max_ms, 1)
+            }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _get_pooled_client(account_sid, auth_token):
+    with _clients_lock:
+        pooled = _clients.get(account_sid)
+        if pooled is None or pooled.auth_token != auth_token:
+            pooled = PooledClient(account_sid, auth_token)
+            _clients[account_sid] = pooled
+        return pooled
+
+
+def get_twilio_client(account_sid, auth_token):
+    """
+    Return the shared Twilio client for an account SID, creating it on first use
+
+    Clients are safe to share across worker threads. A client is rebuilt if the
+    account's auth token changes.
+    """
+    return _get_pooled_client(account_sid, auth_token).client
+
+
+def lookup_twilio_client(account_sid):
+    """
+    Return the shared Twilio client for an account SID, or None if there are no credentials for it
+
+    The account configured in the environment (TWILIO_ACCOUNT_SID) always has
+    credentials. Clients for other accounts exist only while the process that
+    created them runs, which is why /send-alert doesn't accept per-request
+    credentials for outbox notifications.
+    """
+    with _clients_lock:
+        pooled = _clients.get(account_sid)
+        if pooled is not None:
+            return pooled.client
+    if account_sid and account_sid == os.getenv('TWILIO_ACCOUNT_SID') and os.getenv('TWILIO_AUTH_TOKEN'):
+        return get_twilio_client(account_sid, os.getenv('TWILIO_AUTH_TOKEN'))
+    return None
+
+
+def warm_up_twilio(account_sid, auth_token):
+    """
+    Create the client for the configured account and open its connection
+
+    Returns:
+        dict: "ready" and "error"
+    """
+    if not account_sid or not auth_token:
+        return {"ready": False, "error": "Twilio credentials are not configured"}
+    pooled = _get_pooled_client(account_sid, auth_token)
+    if TWILIO_WARM_UP:
+        try:
+            pooled.warm_up()
+        except Exception as e:
+            logger.warning(f"Twilio warm-up failed: {str(e)}")
+            return {"ready": False, "error": str(e)}
+    return {"ready": True, "error": None}
+
+
+def twilio_pool_stats():
+    with _clients_lock:
+        return {f"{sid[:8]}...": pooled.stats() for sid, pooled in _clients.items()}
@@ -0,0 +1,177 @@
+import hashlib
+import io
+import os
+import tempfile
+import logging
+
+logger = logging.getLogger('uploads')
+
+# Uploads up to this size stay in memory; larger ones are moved to a temporary file
+UPLOAD_SPOOL_MEMORY_MB = float(os.getenv('UPLOAD_SPOOL_MEMORY_MB', '1'))
+# Directory for spooled uploads (defaults to the system temp directory)
+UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR') or None
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+
+class SpooledUpload(io.RawIOBase):
+    """
+    Upload buffer that is hashed while it is written
+
+    Data stays in memory up to UPLOAD_SPOOL_MEMORY_MB and is moved to a named
+    temporary file above that (removed again by close()), so concurrent large
+    uploads don't pile up in worker memory. The SHA-256 of the content is computed chunk by chunk as
+    it is written, so it is ready as soon as the upload is. Files on disk can
+    be opened by path in OCR worker processes (see source).
+
+    Args:
+        name: Original file name of the upload (used to pick the OCR path)
+        max_memory: Bytes kept in memory before spilling to disk
+    """
+
+    def __init__(self, name=None, max_memory=None):
+        super().__init__()
+        self.name = name
+        self.max_memory = int(UPLOAD_SPOOL_MEMORY_MB * 1024 * 1024) if max_memory is None else max_memory
+        self.size = 0
+        self._file = io.BytesIO()
+        self._path = None
+        self._hash = hashlib.sha256()
+        self._hash_valid = True
+
+    @property
+    def path(self):
+        """Path of the temporary file, or None while the upload is in memory"""
+        return self._path
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def write(self, data):
+        if self._file.tell() != self.size:
+            # Overwriting earlier bytes; the running hash no longer applies
+            self._hash_valid = False
+        elif self._hash_valid:
+            self._hash.update(data)
+        written = self._file.write(data)
+        self.size = max(self.size, self._file.tell())
+        if self._path is None and self.size > self.max_memory:
+            self._spill()
+        return written
+
+    def _spill(self):
+        position = self._file.tell()
+        # Not deleted on close: on Windows a delete-on-close file can't be
+        # reopened by path (PyMuPDF, OCR worker processes); close() removes it
+        spill = tempfile.NamedTemporaryFile(prefix='upload-', dir=UPLOAD_SPOOL_DIR, delete=False)
+        spill.write(self._file.getbuffer())
+        spill.seek(position)
+        self._file = spill
+        self._path = spill.name
+        logger.info(f"Spooled upload {self.name} to disk after {self.size} bytes")
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readinto(self, buffer):
+        return self._file.readinto(buffer)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    @property
+    def content_hash(self):
+        """SHA-256 hex digest of the content"""
+        if not self._hash_valid:
+            position = self._file.tell()
+            self._file.seek(0)
+            self._hash = hashlib.sha256()
+            for chunk in iter(lambda: self._file.read(UPLOAD_CHUNK_BYTES), b''):
+                self._hash.update(chunk)
+            self._file.seek(position)
+            self._hash_valid = True
+        return self._hash.hexdigest()
+
+    def source(self):
+        """
+        Return what another process should read: the temporary file's path, or
+        the bytes of an in-memory upload
+        """
+        if self._path is not None:
+            self._file.flush()
+            return self._path
+        return self._file.getvalue()
+
+    def getvalue(self):
+        """Return the whole content as bytes"""
+        if self._path is None:
+            return self._file.getvalue()
+        position = self._file.tell()
+        self._file.seek(0)
+        data = self._file.read()
+        self._file.seek(position)
+        return data
+
+    def detach(self):
+        """
+        Take the buffer over from whoever created it (e.g. the request it was
+        uploaded with, which closes its files when it ends)
+
+        Returns:
+            SpooledUpload: An upload for the same content that the caller must close()
+        """
+        upload = SpooledUpload(self.name, self.max_memory)
+        upload.size, upload._file, upload._path = self.size, self._file, self._path
+        upload._hash, upload._hash_valid = self._hash, self._hash_valid
+        upload.seek(0)
+        self._file, self._path = io.BytesIO(), None
+        self.size = 0
+        return upload
+
+    def close(self):
+        if not self.closed:
+            super().close()
+            self._file.close()
+            if self._path is not None:
+                try:
+                    os.unlink(self._path)
+                except OSError as e:
+                    logger.warning(f"Could not remove spooled upload {self._path}: {str(e)}")
+                self._path = None
+
+
+def spool(file_obj, name=None):
+    """
+    Return an upload's content as a rewound SpooledUpload
+
+    A SpooledUpload (or a Werkzeug FileStorage whose stream is one, see
+    SpoolingRequest in app.py) is returned as is; other file objects are
+    copied into a new one in chunks.
+
+    Returns:
+        tuple: (SpooledUpload, bool) - the upload and whether it was created
+            here (and so must be closed by the caller)
+    """
+    stream = getattr(file_obj, 'stream', file_obj)
+    name = name or getattr(file_obj, 'filename', None) or getattr(file_obj, 'name', None)
+    if isinstance(stream, SpooledUpload):
+        stream.name = name or stream.name
+        stream.seek(0)
+        return stream, False
+
+    upload = SpooledUpload(name)
+    for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_BYTES), b''):
+        upload.write(chunk)
+    upload.seek(0)
+    return upload, True
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+import logging
+
+from app import ocr_service
+from app.summary_cache import get_ai_service
+from app.twilio_pool import warm_up_twilio
+
+logger = logging.getLogger('warmup')
+
+# Components that must be ready before the worker reports ready (any of
+# ocr, ai, twilio); the others are reported but don't block readiness
+READY_REQUIRES = [name.strip() for name in os.getenv('READY_REQUIRES', 'ocr').split(',') if name.strip()]
+
+_state = {
+    "started": False,
+    "finished": False,
+    "seconds": None,
+    "components": {
+        "ocr": {"ready": False, "error": "Not warmed up yet"},
+        "ai": {"ready": False, "error": "Not warmed up yet"},
+        "twilio": {"ready": False, "error": "Not warmed up yet"}
+    }
+}
+_lock = threading.Lock()
+
+
+def _warm_up_ocr():
+    status = ocr_service.tesseract_status()
+    if not status["available"]:
+        return {"ready": False, "error": status["error"]}
+    import fitz  # noqa: F401 - PyMuPDF, loaded here so the first PDF doesn't pay for it
+    backend = ocr_service.get_ocr_backend()
+    backend.warm_up()
+    return {"ready": True, "error": None, "backend": backend.name, "version": status["version"]}
+
+
+def _warm_up_ai():
+    ai_service = get_ai_service()
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        # The AI service still produces rule-based summaries without a key
+        return {"ready": True, "error": None, "fallback": True}
+    initialize = getattr(ai_service, 'initialize_genai', None)
+    if initialize is not None and not initialize(api_key):
+        return {"ready": False, "error": "Gemini API initialization failed"}
+    return {"ready": True, "error": None, "fallback": False}
+
+
+def _warm_up_twilio():
+    return warm_up_twilio(os.getenv('TWILIO_ACCOUNT_SID'), os.getenv('TWILIO_AUTH_TOKEN'))
+
+
+WARM_UPS = {
+    "ocr": _warm_up_ocr,
+    "ai": _warm_up_ai,
+    "twilio": _warm_up_twilio
+}
+
+
+def warm_up():
+    """
+    Discover Tesseract, load the OCR engines, PDF library, AI client and
+    Twilio connection so the first request doesn't pay for them
+
+    Safe to call more than once; later calls refresh the component states.
+    Servers call it before a worker accepts traffic (see gunicorn's
+    post_worker_init), the development server runs it in the background.
+    """
+    with _lock:
+        _state["started"] = True
+    start = time.perf_counter()
+    for name, fn in WARM_UPS.items():
+        component_start = time.perf_counter()
+        try:
+            component = fn()
+        except Exception as e:
+            component = {"ready": False, "error": str(e)}
+        component["seconds"] = round(time.perf_counter() - component_start, 3)
+        logger.info(f"Warm-up {name}: {'ready' if component['ready'] else component['error']} "
+                    f"({component['seconds']}s)")
+        with _lock:
+            _state["components"][name] = component
+    with _lock:
+        _state["finished"] = True
+        _state["seconds"] = round(time.perf_counter() - start, 3)
+    return readiness()
+
+
+def start_warm_up():
+    """Run warm_up in a background thread"""
+    thread = threading.Thread(target=warm_up, name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness():
+    """
+    Returns:
+        dict: "ready" (warm-up finished and every READY_REQUIRES component is
+            ready), "warming_up", "seconds" and the state of each component
+    """
+    with _lock:
+        components = {name: dict(state) for name, state in _state["components"].items()}
+        finished = _state["finished"]
+        return {
+            "ready": finished and all(components[name]["ready"] for name in READY_REQUIRES if name in components),
+            "warming_up": _state["started"] and not finished,
+            "seconds": _state["seconds"],
+            "components": components
+        }
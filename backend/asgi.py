@@ -0,0 +1,92 @@
+"""
+Production ASGI entry point
+
+Serves the Flask app in app.py behind an async request layer:
+- Document endpoints (OCR and summarization) run on their own thread lane
+  (DOCUMENT_THREADS per worker) and everything else, emergency alerts
+  included, on another (REQUEST_THREADS), so slow OCR can never take the
+  threads an alert needs.
+- Images are decoded, preprocessed and OCR'd on the OCR process pool, as
+  PDF pages already are; document threads only wait for the result.
+- AI calls run on the summary thread pool under the latency budget, and
+  Twilio messages go out from the outbox's sender pool, so neither blocks
+  the event loop or a request thread for long.
+- /ready and /metrics are answered on the event loop itself.
+
+Run with gunicorn, one uvicorn worker per two cores (see gunicorn.conf.py):
+    gunicorn -c gunicorn.conf.py asgi:application
+or as a single process:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import importlib.util
+import os
+from contextlib import asynccontextmanager
+
+# Workers warm up in the gunicorn post_worker_init hook or the lifespan
+# below, before they accept traffic, rather than in app.py's background thread
+os.environ.setdefault('WARM_UP_ON_START', 'false')
+os.environ.setdefault('OCR_IMAGES_IN_PROCESS_POOL', 'true')
+
+import anyio  # noqa: E402
+from a2wsgi import WSGIMiddleware  # noqa: E402
+from starlette.applications import Starlette  # noqa: E402
+from starlette.responses import JSONResponse, Response  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+from app import metrics, ocr_service  # noqa: E402
+from app.warmup import warm_up, readiness  # noqa: E402
+
+# app.py is a script next to the app package, so it is loaded by path
+_spec = importlib.util.spec_from_file_location(
+    'medivault_flask', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py'))
+flask_app = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(flask_app)
+
+# Threads per worker for document requests and for all other requests
+DOCUMENT_THREADS = int(os.getenv('DOCUMENT_THREADS', '0')) or ocr_service.OCR_PAGE_WORKERS
+REQUEST_THREADS = int(os.getenv('REQUEST_THREADS', '32'))
+
+DOCUMENT_PATHS = ('/process-medical-document', '/test-ocr')
+
+document_lane = WSGIMiddleware(flask_app.app, workers=DOCUMENT_THREADS)
+request_lane = WSGIMiddleware(flask_app.app, workers=REQUEST_THREADS)
+
+
+def is_document_request(path):
+    """OCR and summarization requests (single, streamed, batch and test documents)"""
+    return path.startswith(DOCUMENT_PATHS)
+
+
+async def ready(request):
+    state = readiness()
+    return JSONResponse(dict(state, status="success" if state["ready"] else "error"),
+                        status_code=200 if state["ready"] else 503)
+
+
+async def metrics_endpoint(request):
+    return Response(metrics.render_metrics(), media_type='text/plain; version=0.0.4')
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Under gunicorn the post_worker_init hook has already warmed this worker up
+    if readiness()["seconds"] is None:
+        await anyio.to_thread.run_sync(warm_up)
+    yield
+    ocr_service._reset_page_pool()
+
+
+native = Starlette(routes=[
+    Route('/ready', ready, methods=['GET']),
+    Route('/metrics', metrics_endpoint, methods=['GET'])
+], lifespan=lifespan)
+NATIVE_PATHS = {route.path for route in native.routes}
+
+
+async def application(scope, receive, send):
+    """Route HTTP requests to their Flask lane; lifespan and native routes go to Starlette"""
+    if scope["type"] == "http" and scope["path"] not in NATIVE_PATHS:
+        lane = document_lane if is_document_request(scope["path"]) else request_lane
+        await lane(scope, receive, send)
+    else:
+        await native(scope, receive, send)
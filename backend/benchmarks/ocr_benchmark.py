@@ -0,0 +1,221 @@
+"""
+OCR pipeline benchmark over a synthetic document corpus
+
+Generates documents with create_test_image.generate_corpus and times
+extract_text end to end, plus the stages of extract_from_image (decode,
+each preprocessing stage, OCR) and extract_from_pdf (open, text layer,
+rasterize). Records throughput, peak Python memory and accuracy, saves the
+results as JSON and optionally compares them with an earlier run.
+
+Usage (from the backend directory):
+    python benchmarks/ocr_benchmark.py
+    python benchmarks/ocr_benchmark.py --dpi 150 300 --pages 1 10 --repeat 5
+    python benchmarks/ocr_benchmark.py --baseline benchmarks/results/ocr-20240101-120000.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app import ocr_service, preprocessing  # noqa: E402
+from create_test_image import DOCUMENT_KINDS, generate_corpus  # noqa: E402
+from pdf_dpi_benchmark import char_accuracy  # noqa: E402
+
+RESULTS_DIR = BACKEND_DIR / 'benchmarks' / 'results'
+
+# Slowdowns smaller than this are timer noise, whatever their percentage
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def named_buffer(document):
+    buffer = io.BytesIO(document["data"])
+    buffer.name = document["name"]
+    return buffer
+
+
+def timed(stages, name, fn, *args):
+    """Run fn, adding its duration in seconds to stages[name]"""
+    start = time.perf_counter()
+    result = fn(*args)
+    stages.setdefault(name, []).append(time.perf_counter() - start)
+    return result
+
+
+def image_stages(document, stages):
+    image, _ = timed(stages, "decode", preprocessing.decode_image, io.BytesIO(document["data"]))
+    image, info = timed(stages, "preprocess", preprocessing.preprocess, image)
+    for name, ms in info["timings_ms"].items():
+        stages.setdefault(f"preprocess.{name}", []).append(ms / 1000)
+    timed(stages, "ocr", ocr_service.ocr_image, image)
+    timed(stages, "extract_from_image", ocr_service.extract_from_image, io.BytesIO(document["data"]))
+
+
+def pdf_stages(document, stages):
+    doc = timed(stages, "open", lambda: fitz.open(stream=document["data"], filetype='pdf'))
+    try:
+        texts = timed(stages, "text_layer", lambda: [page.get_text() for page in doc])
+        ocr_pages = [number for number, text in enumerate(texts)
+                     if len("".join(text.split())) < ocr_service.PDF_TEXT_LAYER_MIN_CHARS]
+        timed(stages, "rasterize", lambda: [
+            doc[number].get_pixmap(dpi=ocr_service.OCR_PDF_DPI, colorspace=fitz.csGRAY, alpha=False)
+            for number in ocr_pages])
+    finally:
+        doc.close()
+    timed(stages, "extract_from_pdf", ocr_service.extract_from_pdf, named_buffer(document))
+
+
+def bench_document(document, repeat):
+    stages = {}
+    outcome = None
+    for _ in range(repeat):
+        outcome = timed(stages, "extract_text", ocr_service.extract_text, named_buffer(document))
+        try:
+            if document["kind"].endswith("pdf"):
+                pdf_stages(document, stages)
+            else:
+                image_stages(document, stages)
+        except Exception as e:
+            stages.setdefault("errors", []).append(str(e))
+
+    # Peak memory of a separate run, since tracing slows the timed runs down.
+    # Only the main process is traced (not PDF page OCR workers).
+    tracemalloc.start()
+    ocr_service.extract_text(named_buffer(document))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    errors = stages.pop("errors", [])
+    return {
+        "name": document["name"],
+        "kind": document["kind"],
+        "pages": document["pages"],
+        "bytes": len(document["data"]),
+        "success": outcome["success"],
+        "error": outcome["error"] or (errors[0] if errors else None),
+        "accuracy": round(char_accuracy(document["text"], outcome["text"]), 4),
+        "peak_memory_mb": round(peak / 1024 / 1024, 2),
+        "stages": {
+            name: {"median": round(statistics.median(times), 4), "min": round(min(times), 4)}
+            for name, times in stages.items()
+        }
+    }
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "tesseract": ocr_service.tesseract_status(),
+        "ocr_settings": ocr_service.ocr_settings()
+    }
+
+
+def summarize(documents):
+    seconds = sum(doc["stages"]["extract_text"]["median"] for doc in documents)
+    pages = sum(doc["pages"] for doc in documents)
+    megabytes = sum(doc["bytes"] for doc in documents) / 1024 / 1024
+    return {
+        "documents": len(documents),
+        "pages": pages,
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(pages / seconds, 2) if seconds else None,
+        "mb_per_second": round(megabytes / seconds, 2) if seconds else None,
+        "peak_memory_mb": max((doc["peak_memory_mb"] for doc in documents), default=0)
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print the change of each stage's median against a baseline run and return the regressions"""
+    previous = {doc["name"]: doc for doc in baseline["documents"]}
+    regressions = []
+    print(f"\nCompared with baseline from {baseline['created_at']} (threshold {threshold:.0%}):")
+    for doc in results["documents"]:
+        old = previous.get(doc["name"])
+        if old is None:
+            continue
+        for stage, timing in doc["stages"].items():
+            old_timing = old["stages"].get(stage)
+            if not old_timing or not old_timing["median"]:
+                continue
+            change = timing["median"] / old_timing["median"] - 1
+            regressed = change > threshold and timing["median"] - old_timing["median"] > MIN_REGRESSION_SECONDS
+            if regressed:
+                regressions.append({"document": doc["name"], "stage": stage, "change": round(change, 3)})
+            if stage == "extract_text" or regressed:
+                flag = "  REGRESSION" if regressed else ""
+                print(f"{doc['name']:44} {stage:28} {old_timing['median']:8.3f} s -> {timing['median']:8.3f} s "
+                      f"({change:+.1%}){flag}")
+        if doc["accuracy"] < old["accuracy"] - 0.01:
+            regressions.append({"document": doc["name"], "stage": "accuracy",
+                                "change": round(doc["accuracy"] - old["accuracy"], 4)})
+            print(f"{doc['name']:44} accuracy {old['accuracy']:.2%} -> {doc['accuracy']:.2%}  REGRESSION")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--kinds', nargs='+', default=["png", "scanned_pdf", "text_pdf"], choices=DOCUMENT_KINDS)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 5], help='Page counts of PDFs')
+    parser.add_argument('--dpi', type=int, nargs='+', default=[150, 300], help='Scan resolutions')
+    parser.add_argument('--noise', type=float, nargs='+', default=[0.0, 0.08], help='Gaussian noise levels (0-1)')
+    parser.add_argument('--skew', type=float, nargs='+', default=[0.0, 3.0], help='Page rotations in degrees')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per document (median and min are reported)')
+    parser.add_argument('--output', help='Results JSON file (defaults to benchmarks/results/ocr-<timestamp>.json)')
+    parser.add_argument('--baseline', help='Earlier results JSON file to compare with')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='Slowdown of a stage median that counts as a regression')
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.kinds, args.pages, args.dpi, args.noise, args.skew)
+    print(f"Benchmarking {len(corpus)} documents, {args.repeat} runs each")
+
+    documents = []
+    for document in corpus:
+        result = bench_document(document, args.repeat)
+        documents.append(result)
+        status = f"accuracy {result['accuracy']:.2%}" if result["success"] else f"FAILED: {result['error']}"
+        print(f"{result['name']:44} {result['stages']['extract_text']['median']:8.3f} s  "
+              f"{result['peak_memory_mb']:7.1f} MB  {status}")
+
+    created_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+    results = {
+        "created_at": created_at,
+        "environment": environment(),
+        "summary": summarize(documents),
+        "documents": documents
+    }
+    summary = results["summary"]
+    print(f"\n{summary['pages']} pages in {summary['seconds']} s: {summary['pages_per_second']} pages/s, "
+          f"{summary['mb_per_second']} MB/s, peak {summary['peak_memory_mb']} MB")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        results["regressions"] = regressions
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"ocr-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    os.makedirs(output.parent, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if regressions:
+        print(f"{len(regressions)} regressions found")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Accuracy vs. time of scanned-PDF OCR at several render resolutions
+
+Builds image-only PDFs from the static/test_docs samples, OCRs them at each
+render DPI and compares the output with the known text of each sample.
+
+Usage (from the backend directory):
+    python benchmarks/pdf_dpi_benchmark.py
+    python benchmarks/pdf_dpi_benchmark.py --dpi 72 150 300 --repeat 5 --json dpi.json
+"""
+import argparse
+import difflib
+import json
+import sys
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.ocr_service import ocr_pdf_pages  # noqa: E402
+from create_test_image import report_text  # noqa: E402
+
+TEST_DOCS = BACKEND_DIR / 'static' / 'test_docs'
+DEFAULT_DPIS = [72, 100, 150, 200, 300, 400]
+
+
+def scanned_pdf_from_text(text, scan_dpi):
+    """Typeset text on a page and rasterize it into an image-only PDF"""
+    source = fitz.open()
+    page = source.new_page()
+    page.insert_text((72, 72), text, fontsize=11)
+    pix = page.get_pixmap(dpi=scan_dpi, colorspace=fitz.csGRAY, alpha=False)
+
+    scan = fitz.open()
+    scan_page = scan.new_page(width=page.rect.width, height=page.rect.height)
+    scan_page.insert_image(scan_page.rect, pixmap=pix)
+    return scan.tobytes(deflate=True)
+
+
+def scanned_pdf_from_image(path, image_dpi):
+    """Place an image on a page sized as if it had been scanned at image_dpi"""
+    pix = fitz.Pixmap(str(path))
+    scan = fitz.open()
+    page = scan.new_page(width=pix.width * 72 / image_dpi, height=pix.height * 72 / image_dpi)
+    page.insert_image(page.rect, pixmap=pix)
+    return scan.tobytes(deflate=True)
+
+
+def load_samples(scan_dpi):
+    """Return (name, pdf bytes, ground truth text) for each sample document"""
+    samples = []
+
+    prescription = TEST_DOCS / 'sample_prescription.txt'
+    if prescription.exists():
+        text = "\n".join(line.strip() for line in prescription.read_text().splitlines())
+        samples.append(('sample_prescription.txt', scanned_pdf_from_text(text.strip(), scan_dpi), text))
+
+    report = TEST_DOCS / 'test_medical_report.png'
+    if report.exists() and report.stat().st_size:
+        samples.append(('test_medical_report.png', scanned_pdf_from_image(report, 100), report_text()))
+
+    return samples
+
+
+def char_accuracy(expected, actual):
+    """Similarity of whitespace-normalized texts (1.0 is a perfect match)"""
+    expected = " ".join(expected.lower().split())
+    actual = " ".join(actual.lower().split())
+    return difflib.SequenceMatcher(None, expected, actual, autojunk=False).ratio()
+
+
+def run(dpis, repeat, scan_dpi):
+    results = []
+    for name, pdf_data, truth in load_samples(scan_dpi):
+        page_numbers = list(range(fitz.open(stream=pdf_data, filetype='pdf').page_count))
+        for dpi in dpis:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                text = "\n".join(ocr_pdf_pages(pdf_data, page_numbers, dpi=dpi))
+                timings.append(time.perf_counter() - start)
+            results.append({
+                "sample": name,
+                "dpi": dpi,
+                "seconds": round(min(timings), 3),
+                "accuracy": round(char_accuracy(truth, text), 4)
+            })
+            print(f"{name:28} {dpi:>4} DPI  {min(timings):7.3f} s  accuracy {results[-1]['accuracy']:.2%}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dpi', type=int, nargs='+', default=DEFAULT_DPIS, help='Render resolutions to compare')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per resolution (fastest is reported)')
+    parser.add_argument('--scan-dpi', type=int, default=300, help='Resolution of the simulated scans')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    results = run(args.dpi, args.repeat, args.scan_dpi)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,203 @@
 from PIL import Image, ImageDraw, ImageFont
+import argparse
+import io
+import json
 import os
 from pathlib import Path
 
+import fitz  # PyMuPDF
+import numpy as np
+
+# Content of the test medical report: (y position, font, text)
+REPORT_LINES = [
+    (50, "title", "MEDICAL REPORT"),
+    (80, "header", "PATIENT INFORMATION"),
+    (110, "body", "Name: John Smith"),
+    (130, "body", "DOB: 01/15/1980"),
+    (150, "body", "Medical Record #: 12345678"),
+    (170, "body", "Date of Visit: 06/12/2023"),
+    (210, "header", "VITAL SIGNS"),
+    (240, "body", "Blood Pressure: 120/80 mmHg"),
+    (260, "body", "Heart Rate: 72 bpm"),
+    (280, "body", "Respiratory Rate: 16 breaths/min"),
+    (300, "body", "Temperature: 98.6°F (37°C)"),
+    (320, "body", "Oxygen Saturation: 98%"),
+    (360, "header", "DIAGNOSIS"),
+    (390, "body", "Primary: Hypertension (I10)"),
+    (410, "body", "Secondary: Type 2 Diabetes Mellitus (E11.9)"),
+    (450, "header", "MEDICATIONS"),
+    (480, "body", "1. Lisinopril 10mg - Take 1 tablet daily"),
+    (500, "body", "2. Metformin 500mg - Take 1 tablet twice daily with meals"),
+    (520, "body", "3. Atorvastatin 20mg - Take 1 tablet at bedtime"),
+    (560, "header", "LABORATORY RESULTS"),
+    (590, "body", "Glucose: 126 mg/dL (High)"),
+    (610, "body", "HbA1c: 7.2% (High)"),
+    (630, "body", "Total Cholesterol: 210 mg/dL (High)"),
+    (650, "body", "LDL: 130 mg/dL (High)"),
+    (670, "body", "HDL: 45 mg/dL (Normal)"),
+    (690, "body", "Triglycerides: 150 mg/dL (Borderline High)"),
+    (730, "header", "RECOMMENDATIONS"),
+    (760, "body", "1. Follow low-sodium, diabetic diet"),
+    (780, "body", "2. Exercise 30 minutes daily, 5 days per week"),
+    (800, "body", "3. Monitor blood glucose levels twice daily"),
+    (820, "body", "4. Schedule follow-up appointment in 3 months"),
+    (860, "header", "SIGNATURE"),
+    (890, "body", "Dr. Jane Williams, MD"),
+    (910, "body", "License #: MD12345"),
+    (930, "body", "Date: 06/12/2023")
+]
+
+# Corpus page layout: US Letter, with REPORT_LINES positions given at 100 DPI
+PAGE_SIZE_INCHES = (8.5, 11)
+LAYOUT_DPI = 100
+FONT_POINTS = {"title": 17, "header": 12, "body": 10}
+TRUETYPE_FONTS = ["arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf"]
+
+# Kinds of generated documents
+DOCUMENT_KINDS = ["png", "jpg", "scanned_pdf", "text_pdf"]
+
+def report_text():
+    """Return the text drawn on the test medical report (OCR ground truth)"""
+    return "\n".join(text for _, _, text in REPORT_LINES)
+
+def page_lines(page_number=1, page_count=1):
+    """Return the (y, font, text) lines of one corpus page"""
+    lines = list(REPORT_LINES)
+    if page_count > 1:
+        lines.append((970, "body", f"Page {page_number} of {page_count}"))
+    return lines
+
+def page_text(page_number=1, page_count=1):
+    """Return the text of one corpus page (OCR ground truth)"""
+    return "\n".join(text for _, _, text in page_lines(page_number, page_count))
+
+def _load_font(pixels):
+    """Load a TrueType font at a pixel size, or None if no TrueType font is installed"""
+    for name in TRUETYPE_FONTS:
+        try:
+            return ImageFont.truetype(name, pixels)
+        except OSError:
+            continue
+    return None
+
+def render_page(page_number=1, page_count=1, dpi=150, noise=0.0, skew=0.0, seed=0):
+    """
+    Render a corpus page as a grayscale scan
+    
+    Args:
+        dpi: Scan resolution
+        noise: Standard deviation of the added Gaussian noise, as a fraction of full scale
+        skew: Rotation of the page in degrees
+        seed: Seed of the noise
+    
+    Returns:
+        PIL.Image: Grayscale page image
+    """
+    fonts = {name: _load_font(int(points * dpi / 72)) for name, points in FONT_POINTS.items()}
+    # Without TrueType fonts, draw with the bitmap font at layout resolution and scale up
+    draw_dpi = dpi if all(fonts.values()) else LAYOUT_DPI
+    if draw_dpi != dpi:
+        fonts = {name: ImageFont.load_default() for name in FONT_POINTS}
+    
+    scale = draw_dpi / LAYOUT_DPI
+    size = (int(PAGE_SIZE_INCHES[0] * draw_dpi), int(PAGE_SIZE_INCHES[1] * draw_dpi))
+    image = Image.new('L', size, color=255)
+    draw = ImageDraw.Draw(image)
+    for y, font, text in page_lines(page_number, page_count):
+        draw.text((int(50 * scale), int(y * scale)), text, font=fonts[font], fill=0)
+    
+    if draw_dpi != dpi:
+        image = image.resize((int(PAGE_SIZE_INCHES[0] * dpi), int(PAGE_SIZE_INCHES[1] * dpi)), Image.LANCZOS)
+    if skew:
+        image = image.rotate(skew, resample=Image.BICUBIC, fillcolor=255)
+    if noise:
+        rng = np.random.default_rng(seed)
+        pixels = np.asarray(image, dtype=np.float32) + rng.normal(0, noise * 255, (image.height, image.width))
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return image
+
+def _text_pdf(page_count):
+    doc = fitz.open()
+    for page_number in range(1, page_count + 1):
+        page = doc.new_page(width=PAGE_SIZE_INCHES[0] * 72, height=PAGE_SIZE_INCHES[1] * 72)
+        for y, font, text in page_lines(page_number, page_count):
+            page.insert_text((36, y * 72 / LAYOUT_DPI), text, fontsize=FONT_POINTS[font])
+    return doc.tobytes(deflate=True)
+
+def _scanned_pdf(pages):
+    doc = fitz.open()
+    for image in pages:
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        page = doc.new_page(width=PAGE_SIZE_INCHES[0] * 72, height=PAGE_SIZE_INCHES[1] * 72)
+        page.insert_image(page.rect, stream=buffer.getvalue())
+    return doc.tobytes(deflate=True)
+
+def generate_document(kind="png", pages=1, dpi=150, noise=0.0, skew=0.0, seed=0):
+    """
+    Generate a synthetic medical document
+    
+    Args:
+        kind: "png" or "jpg" (a single scanned page), "scanned_pdf" (image-only
+            pages) or "text_pdf" (pages with a text layer; dpi, noise and skew
+            don't apply)
+        pages: Page count (images always have one page)
+    
+    Returns:
+        dict: "name", "kind", "pages", "data" (file bytes) and "text" (ground truth)
+    """
+    if kind not in DOCUMENT_KINDS:
+        raise ValueError(f"Unknown document kind: {kind}")
+    if kind in ("png", "jpg"):
+        pages = 1
+    
+    text = "\n".join(page_text(number, pages) for number in range(1, pages + 1))
+    if kind == "text_pdf":
+        name = f"text_{pages}p.pdf"
+        data = _text_pdf(pages)
+    else:
+        images = [render_page(number, pages, dpi, noise, skew, seed + number) for number in range(1, pages + 1)]
+        stem = f"{dpi}dpi_noise{noise:g}_skew{skew:g}"
+        if kind == "scanned_pdf":
+            name = f"scanned_{pages}p_{stem}.pdf"
+            data = _scanned_pdf(images)
+        else:
+            name = f"scan_{stem}.{kind}"
+            buffer = io.BytesIO()
+            images[0].save(buffer, format='PNG' if kind == 'png' else 'JPEG', quality=85)
+            data = buffer.getvalue()
+    
+    return {"name": name, "kind": kind, "pages": pages, "data": data, "text": text}
+
+def generate_corpus(kinds=("png", "scanned_pdf", "text_pdf"), pages=(1,), dpis=(150,), noises=(0.0,), skews=(0.0,), seed=0):
+    """
+    Generate one document for every combination of the given parameters
+    
+    Parameters that don't apply to a kind (dpi, noise and skew for text PDFs,
+    page count for images) don't multiply its documents.
+    """
+    documents = {}
+    for kind in kinds:
+        for page_count in ([1] if kind in ("png", "jpg") else pages):
+            for dpi in ([None] if kind == "text_pdf" else dpis):
+                for noise in ([0.0] if kind == "text_pdf" else noises):
+                    for skew in ([0.0] if kind == "text_pdf" else skews):
+                        document = generate_document(kind, page_count, dpi or 150, noise, skew, seed)
+                        documents[document["name"]] = document
+    return list(documents.values())
+
+def write_corpus(documents, output_dir):
+    """Write documents and a manifest.json with their ground truth text to output_dir"""
+    output_dir = Path(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = []
+    for document in documents:
+        (output_dir / document["name"]).write_bytes(document["data"])
+        manifest.append({key: document[key] for key in ("name", "kind", "pages", "text")})
+    with open(output_dir / 'manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return output_dir
+
 # Create a test image with medical text that can be used for OCR testing
 def create_test_medical_image():
     # Create output directory if it doesn't exist
@@ -54,47 +250,9 @@ def create_test_medical_image():
         body_font = ImageFont.load_default()
     
     # Add medical report content
-    draw.text((50, 50), "MEDICAL REPORT", font=title_font, fill=(0, 0, 0))
-    draw.text((50, 80), "PATIENT INFORMATION", font=header_font, fill=(0, 0, 0))
-    draw.text((50, 110), "Name: John Smith", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 130), "DOB: 01/15/1980", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 150), "Medical Record #: 12345678", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 170), "Date of Visit: 06/12/2023", font=body_font, fill=(0, 0, 0))
-    
-    draw.text((50, 210), "VITAL SIGNS", font=header_font, fill=(0, 0, 0))
-    draw.text((50, 240), "Blood Pressure: 120/80 mmHg", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 260), "Heart Rate: 72 bpm", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 280), "Respiratory Rate: 16 breaths/min", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 300), "Temperature: 98.6°F (37°C)", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 320), "Oxygen Saturation: 98%", font=body_font, fill=(0, 0, 0))
-    
-    draw.text((50, 360), "DIAGNOSIS", font=header_font, fill=(0, 0, 0))
-    draw.text((50, 390), "Primary: Hypertension (I10)", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 410), "Secondary: Type 2 Diabetes Mellitus (E11.9)", font=body_font, fill=(0, 0, 0))
-    
-    draw.text((50, 450), "MEDICATIONS", font=header_font, fill=(0, 0, 0))
-    draw.text((50, 480), "1. Lisinopril 10mg - Take 1 tablet daily", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 500), "2. Metformin 500mg - Take 1 tablet twice daily with meals", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 520), "3. Atorvastatin 20mg - Take 1 tablet at bedtime", font=body_font, fill=(0, 0, 0))
-    
-    draw.text((50, 560), "LABORATORY RESULTS", font=header_font, fill=(0, 0, 0))
-    draw.text((50, 590), "Glucose: 126 mg/dL (High)", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 610), "HbA1c: 7.2% (High)", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 630), "Total Cholesterol: 210 mg/dL (High)", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 650), "LDL: 130 mg/dL (High)", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 670), "HDL: 45 mg/dL (Normal)", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 690), "Triglycerides: 150 mg/dL (Borderline High)", font=body_font, fill=(0, 0, 0))
-    
-    draw.text((50, 730), "RECOMMENDATIONS", font=header_font, fill=(0, 0, 0))
-    draw.text((50, 760), "1. Follow low-sodium, diabetic diet", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 780), "2. Exercise 30 minutes daily, 5 days per week", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 800), "3. Monitor blood glucose levels twice daily", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 820), "4. Schedule follow-up appointment in 3 months", font=body_font, fill=(0, 0, 0))
-    
-    draw.text((50, 860), "SIGNATURE", font=header_font, fill=(0, 0, 0))
-    draw.text((50, 890), "Dr. Jane Williams, MD", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 910), "License #: MD12345", font=body_font, fill=(0, 0, 0))
-    draw.text((50, 930), "Date: 06/12/2023", font=body_font, fill=(0, 0, 0))
+    fonts = {"title": title_font, "header": header_font, "body": body_font}
+    for y, font, text in REPORT_LINES:
+        draw.text((50, y), text, font=fonts[font], fill=(0, 0, 0))
     
     # Draw a border
     draw.rectangle([(20, 20), (width-20, height-20)], outline=(0, 0, 0), width=2)
@@ -105,9 +263,24 @@ def create_test_medical_image():
     return output_path
 
 if __name__ == "__main__":
-    print("Creating test medical image for OCR testing...")
-    image_path = create_test_medical_image()
-    print(f"Test image created successfully at: {image_path}")
-    print("You can now use this image to test the OCR functionality.")
-    print("Run the following to test it:")
-    print("python ocr_debug.py") 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create test documents for OCR testing")
+    parser.add_argument('--corpus', metavar='DIR', help='Write a synthetic corpus to DIR instead of the test image')
+    parser.add_argument('--kinds', nargs='+', default=["png", "scanned_pdf", "text_pdf"], choices=DOCUMENT_KINDS)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 5], help='Page counts of PDFs')
+    parser.add_argument('--dpi', type=int, nargs='+', default=[150, 300], help='Scan resolutions')
+    parser.add_argument('--noise', type=float, nargs='+', default=[0.0, 0.08], help='Gaussian noise levels (0-1)')
+    parser.add_argument('--skew', type=float, nargs='+', default=[0.0, 3.0], help='Page rotations in degrees')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    if args.corpus:
+        documents = generate_corpus(args.kinds, args.pages, args.dpi, args.noise, args.skew, args.seed)
+        output_dir = write_corpus(documents, args.corpus)
+        print(f"{len(documents)} documents written to {output_dir}")
+    else:
+        print("Creating test medical image for OCR testing...")
+        image_path = create_test_medical_image()
+        print(f"Test image created successfully at: {image_path}")
+        print("You can now use this image to test the OCR functionality.")
+        print("Run the following to test it:")
+        print("python ocr_debug.py") 
\ No newline at end of file
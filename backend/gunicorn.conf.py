@@ -0,0 +1,38 @@
+"""
+Gunicorn configuration for the production ASGI server (see asgi.py)
+
+    gunicorn -c gunicorn.conf.py asgi:application
+
+Worker and OCR process counts scale with the machine's cores; override them
+with WEB_CONCURRENCY and OCR_PAGE_WORKERS.
+"""
+import multiprocessing
+import os
+
+CPU_COUNT = multiprocessing.cpu_count()
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# One event-loop worker per two cores (at least two, so a worker restart
+# never takes the service down)
+workers = int(os.getenv('WEB_CONCURRENCY', '0')) or max(2, CPU_COUNT // 2)
+
+# Every worker has its own OCR process pool; split the cores between them so
+# all workers together run about one OCR process per core
+os.environ.setdefault('OCR_PAGE_WORKERS', str(max(1, CPU_COUNT // workers)))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+
+# Workers start their own outbox sender and OCR pools, which must not be
+# inherited through fork from a preloaded master
+preload_app = False
+
+
+def post_worker_init(worker):
+    """Warm the worker up (Tesseract, OCR engines, AI and Twilio clients) before it accepts requests"""
+    from app.warmup import warm_up
+    state = warm_up()
+    worker.log.info(f"Worker {worker.pid} warmed up in {state['seconds']}s (ready: {state['ready']})")
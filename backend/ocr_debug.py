@@ -1,5 +1,6 @@
 import os
 import sys
+import importlib.util
 import logging
 from pathlib import Path
 
@@ -38,32 +39,29 @@ if not sample_text_path.exists():
 
 try:
     logger.info("Testing OCR availability...")
-    # Try to import pytesseract to check if it's installed
-    try:
-        import pytesseract
+    # Check that pytesseract is installed (the OCR service imports it on first use)
+    if importlib.util.find_spec("pytesseract") is not None:
         logger.info("pytesseract module is installed.")
-    except ImportError:
+    else:
         logger.error("pytesseract module is not installed. Install with: pip install pytesseract")
         sys.exit(1)
 
     # Now import our OCR service
     try:
-        from app.ocr_service import setup_tesseract, extract_text
+        from app.ocr_service import tesseract_status, extract_text
         logger.info("OCR service module imported successfully.")
     except ImportError as e:
         logger.error(f"Failed to import OCR service: {e}")
         sys.exit(1)
 
-    # Test Tesseract configuration
-    if setup_tesseract():
-        try:
-            version = pytesseract.get_tesseract_version()
-            logger.info(f"Tesseract is configured properly. Version: {version}")
-        except Exception as e:
-            logger.error(f"Tesseract is configured but version check failed: {e}")
-            logger.error("Tesseract might not be installed or executable not found in PATH")
+    # Test Tesseract configuration (same discovery the server uses, cached)
+    status = tesseract_status()
+    if status["available"]:
+        source = "discovery cache" if status["cached"] else "tesseract --version"
+        logger.info(f"Tesseract is configured properly. Version: {status['version']} at {status['path']} (from {source})")
     else:
-        logger.error("Tesseract configuration failed. Make sure Tesseract OCR is installed.")
+        logger.error(f"Tesseract configuration failed: {status['error']}")
+        logger.error("Make sure Tesseract OCR is installed.")
         logger.error("Download from: https://github.com/UB-Mannheim/tesseract/wiki")
         
         # Windows-specific help
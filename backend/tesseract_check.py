@@ -7,6 +7,21 @@ def check_tesseract_installed():
     """Check if Tesseract is installed and available in the PATH"""
     print("Checking Tesseract OCR installation...")
     
+    # Use the server's own discovery (cached across runs) when its Python
+    # dependencies are installed; otherwise probe directly below
+    try:
+        from app.ocr_service import tesseract_status
+    except ImportError:
+        tesseract_status = None
+    if tesseract_status is not None:
+        status = tesseract_status()
+        if status["available"]:
+            print(f"✅ Tesseract found at: {status['path']}")
+            print(f"Version information: {status['version']}")
+            return True
+        print(f"❌ Tesseract not available: {status['error']}")
+        return False
+    
     try:
         if platform.system() == 'Windows':
             # On Windows, we'll check for the typical installation paths